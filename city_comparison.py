@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""
+Command line entry point for the city comparison pipeline.
+
+  python city_comparison.py ingest census data/census/PEP_2017_...csv out.csv
+  python city_comparison.py join --data-dir data --output city_comparison.csv
+  python city_comparison.py query --city 'new york'
+  python city_comparison.py bench experian data/experian/*_credit_score.csv
+  python city_comparison.py bench census data/census/PEP_2017_...csv \
+    --other-source experian --other-file-paths data/experian/*_credit_score.csv \
+    --profile join.folded
+  python city_comparison.py serve --port 8080
+
+Heavy modules (pandas, the Excel reader, scipy) are only imported by the
+subcommands that need them, so `query` starts in a few tens of milliseconds.
+"""
+
+import argparse
+import contextlib
+import csv
+import importlib
+import sys
+import time
+
+# Source name => (module, DataTable class) for `ingest` and `bench`.
+SOURCES = {
+  'census': ('data_table_census', 'Census'),
+  'experian': ('data_table_experian', 'Experian'),
+  'fbi': ('data_table_fbi', 'Fbi'),
+  'gazetteer': ('data_table_gazetteer', 'Gazetteer'),
+}
+
+# Sources whose `read` accepts a list of files.  The others read one file.
+MULTI_FILE_SOURCES = {'experian'}
+
+# Source => headers_cleanup data source, for sources whose fuzzy matching keys
+# only exist once the headers are cleaned up, as the join pipeline does.
+JOIN_HEADERS = {'census': 'census_2017'}
+
+START_TIME = time.perf_counter()
+
+
+class Timer:
+  """Record how long named steps take, and report them to stderr."""
+
+  def __init__(self):
+    self.timings = []
+
+  @contextlib.contextmanager
+  def time(self, label):
+    """Context manager recording the time spent in its body as `label`."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.timings.append((label, time.perf_counter() - start))
+
+  def report(self):
+    """Print timings, and the total since the process started, to stderr."""
+    for label, seconds in self.timings:
+      print('{:>10.1f} ms  {}'.format(seconds * 1000, label), file=sys.stderr)
+    total_seconds = time.perf_counter() - START_TIME
+    print('{:>10.1f} ms  total'.format(total_seconds * 1000), file=sys.stderr)
+
+
+def import_source(timer, source):
+  """Import the DataTable class for `source`, timing the import."""
+  module_name, class_name = SOURCES[source]
+  with timer.time('import ' + module_name):
+    module = importlib.import_module(module_name)
+  return getattr(module, class_name)
+
+
+def read_files(file_paths):
+  """Experian reads a list of files; every other source reads one file.
+
+  `parse_args` rejects more than one file for other sources.
+  """
+  return file_paths if len(file_paths) > 1 else file_paths[0]
+
+
+def ingest(args, timer):
+  """Read one data source and write it out as CSV."""
+  data_table_class = import_source(timer, args.source)
+  with timer.time('read ' + args.source):
+    data_table = data_table_class(file_path=read_files(args.file_paths))
+  with timer.time('write ' + args.output):
+    data_table.data.to_csv(args.output)
+  print('{}: {} rows'.format(args.output, len(data_table.data)))
+
+
+def join(args, timer):
+  """Run the full join pipeline."""
+  with timer.time('import join_cities_csv'):
+    join_cities_csv = importlib.import_module('join_cities_csv')
+  with timer.time('join'):
+    join_cities_csv.main(data_dir=args.data_dir,
+                         output_file=args.output,
+                         index_file=args.index,
+                         debug=args.debug)
+
+
+def query(args, timer):
+  """Look up cities in the joined CSV, without loading pandas."""
+  if args.near is not None:
+    query_near(args, timer)
+    return
+  conditions = {'city': args.city, 'state': args.state}
+  conditions = {
+    key: value.lower() for key, value in conditions.items() if value is not None
+  }
+  with timer.time('query ' + args.input):
+    # `join` writes the CSV with pandas' default encoding, UTF-8.
+    with open(args.input, newline='', encoding='utf-8') as input_file:
+      rows = [
+        row for row in csv.DictReader(input_file)
+        if all(row[key] == value for key, value in conditions.items())
+      ]
+  columns = args.columns or (list(rows[0].keys()) if rows else [])
+  writer = csv.DictWriter(sys.stdout,
+                          fieldnames=columns,
+                          extrasaction='ignore',
+                          lineterminator='\n')
+  writer.writeheader()
+  writer.writerows(rows)
+
+
+def query_near(args, timer):
+  """Look up cities near a location in the saved spatial index."""
+  with timer.time('import spatial_index'):
+    spatial_index = importlib.import_module('spatial_index')
+  with timer.time('load ' + args.index):
+    index = spatial_index.SpatialIndex.load(args.index)
+  latitude, longitude = args.near
+  with timer.time('query'):
+    if args.k is not None:
+      rows = index.query_nearest(latitude, longitude, k=args.k)
+    else:
+      rows = index.query_radius(latitude, longitude, args.miles)
+  columns = args.columns or list(rows.columns)
+  rows.to_csv(sys.stdout, columns=columns, index=False)
+
+
+def cleanup_join_headers(source, data_table):
+  """Clean up headers that `source`'s fuzzy matching keys depend on."""
+  if source in JOIN_HEADERS:
+    headers_cleanup = importlib.import_module('headers_cleanup')
+    headers_cleanup.cleanup_headers(JOIN_HEADERS[source], data_table.data)
+
+
+def bench(args, timer):
+  """Time importing, reading and joining a data source."""
+  data_table_class = import_source(timer, args.source)
+  file_path = read_files(args.file_paths)
+  for i in range(args.repeat):
+    with timer.time('read {} #{}'.format(args.source, i + 1)):
+      data_table = data_table_class(file_path=file_path)
+  cleanup_join_headers(args.source, data_table)
+  if args.other_source is None:
+    # Join with a copy of itself, where every comparison is an exact match.
+    other_source = args.source
+    other_data_table = data_table_class(data=data_table.data, suffix='_bench')
+  else:
+    other_source = args.other_source
+    other_data_table_class = import_source(timer, other_source)
+    other_file_path = read_files(args.other_file_paths)
+    with timer.time('read ' + other_source):
+      other_data_table = other_data_table_class(file_path=other_file_path,
+                                                suffix='_bench')
+    cleanup_join_headers(other_source, other_data_table)
+  profiler = None
+  if args.profile is not None:
+    profiler = importlib.import_module('join_profiler').JoinProfiler()
+  for i in range(args.repeat):
+    with timer.time('fuzzy join {} with {} #{}'.format(args.source,
+                                                       other_source, i + 1)):
+      data_table.join_fuzzy_matching(other_data_table, profiler=profiler)
+  if profiler is not None:
+    print(profiler.summary())
+    profiler.write_flamegraph(args.profile)
+
+
+def serve(args, timer):
+  """Serve comparisons over the joined CSV until interrupted."""
+  with timer.time('import city_comparison_server'):
+    asyncio = importlib.import_module('asyncio')
+    server = importlib.import_module('city_comparison_server')
+  try:
+    asyncio.run(
+      server.serve(args.input,
+                   host=args.host,
+                   port=args.port,
+                   unix_socket=args.unix_socket))
+  except KeyboardInterrupt:
+    pass
+
+
+def parse_args(argv=None):
+  """Parse command line arguments."""
+  parser = argparse.ArgumentParser(
+    description=__doc__.split('\n\n', maxsplit=1)[0])
+  parser.add_argument('--timing',
+                      action='store_true',
+                      help='Report import and step timings to stderr.')
+  subparsers = parser.add_subparsers(dest='command', required=True)
+
+  ingest_parser = subparsers.add_parser('ingest', help=ingest.__doc__)
+  ingest_parser.add_argument('source', choices=sorted(SOURCES))
+  ingest_parser.add_argument('file_paths', nargs='+', metavar='file_path')
+  ingest_parser.add_argument('output', help='CSV file to write.')
+  ingest_parser.set_defaults(function=ingest)
+
+  join_parser = subparsers.add_parser('join', help=join.__doc__)
+  join_parser.add_argument('--data-dir', default='data')
+  join_parser.add_argument('--output', default='city_comparison.csv')
+  join_parser.add_argument('--index', default='city_comparison_index.pickle')
+  join_parser.add_argument('--debug',
+                           action='store_true',
+                           help='Print out 2 rows out of each dataframe.')
+  join_parser.set_defaults(function=join)
+
+  query_parser = subparsers.add_parser('query', help=query.__doc__)
+  query_parser.add_argument('--input', default='city_comparison.csv')
+  query_parser.add_argument('--index', default='city_comparison_index.pickle')
+  query_parser.add_argument('--city')
+  query_parser.add_argument('--state')
+  query_parser.add_argument('--near',
+                            nargs=2,
+                            type=float,
+                            metavar=('LATITUDE', 'LONGITUDE'),
+                            help='Query the spatial index instead.')
+  query_parser.add_argument('--miles', type=float, default=50)
+  query_parser.add_argument('--k',
+                            type=int,
+                            help='Find the k closest cities to --near.')
+  query_parser.add_argument('--columns', nargs='+')
+  query_parser.set_defaults(function=query)
+
+  bench_parser = subparsers.add_parser('bench', help=bench.__doc__)
+  bench_parser.add_argument('source', choices=sorted(SOURCES))
+  bench_parser.add_argument('file_paths', nargs='+', metavar='file_path')
+  bench_parser.add_argument(
+    '--other-source',
+    choices=sorted(SOURCES),
+    help='Join with this source instead of a copy of the first one.')
+  bench_parser.add_argument('--other-file-paths',
+                            nargs='+',
+                            metavar='FILE_PATH',
+                            help='Files to read --other-source from.')
+  bench_parser.add_argument('--repeat', type=int, default=3)
+  bench_parser.add_argument(
+    '--profile',
+    metavar='FLAMEGRAPH_FILE',
+    help='Profile the fuzzy join, print a summary and write folded stacks.')
+  bench_parser.set_defaults(function=bench, timing=True)
+
+  serve_parser = subparsers.add_parser('serve', help=serve.__doc__)
+  serve_parser.add_argument('--input', default='city_comparison.csv')
+  serve_parser.add_argument('--host', default='127.0.0.1')
+  serve_parser.add_argument('--port', type=int, default=8080)
+  serve_parser.add_argument('--unix-socket',
+                            help='Listen on this Unix socket instead.')
+  serve_parser.set_defaults(function=serve)
+
+  args = parser.parse_args(argv)
+  if args.command in ('ingest', 'bench'):
+    check_file_paths(parser, args.source, args.file_paths)
+  if args.command == 'bench':
+    if (args.other_source is None) != (args.other_file_paths is None):
+      parser.error('--other-source and --other-file-paths go together')
+    check_file_paths(parser, args.other_source, args.other_file_paths)
+  return args
+
+
+def check_file_paths(parser, source, file_paths):
+  """Exit with a usage error if a single file source gets more than one."""
+  if file_paths and len(file_paths) > 1 and source not in MULTI_FILE_SOURCES:
+    parser.error('{} reads a single file, got {}'.format(
+      source, len(file_paths)))
+
+
+def main(argv=None):
+  """Run the subcommand given on the command line."""
+  args = parse_args(argv)
+  timer = Timer()
+  args.function(args, timer)
+  if args.timing:
+    timer.report()
+
+
+if __name__ == '__main__':
+  main()
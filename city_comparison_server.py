@@ -0,0 +1,333 @@
+"""
+Long-lived lookup service over the joined city table.
+
+Loads city_comparison.csv once, answers comparisons and state aggregates over
+HTTP (TCP or Unix socket), caches computed answers, and reloads the table when
+the file changes, without dropping requests.
+
+  GET /city?city=sunnyvale&state=california
+  GET /compare?city_a=sunnyvale&state_a=california&city_b=...&state_b=...
+  GET /state?state=california
+  GET /stats
+"""
+
+import asyncio
+import collections
+import json
+import math
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+import numpy
+import pandas
+from data_table_census import Census
+from data_validation import Schema, ValidationError, find_problems
+
+# Status code => reason phrase, for the responses we send.
+REASONS = {
+  200: 'OK',
+  400: 'Bad Request',
+  404: 'Not Found',
+  405: 'Method Not Allowed',
+  500: 'Internal Server Error'
+}
+
+# Columns the server looks cities up by.  A table without them, or without any
+# rows, is rejected instead of replacing the one being served.
+CITY_TABLE_SCHEMA = Schema(required_columns=['city', 'state'],
+                           non_null_columns=['city', 'state'])
+
+
+class RequestError(Exception):
+  """A request that can't be answered, reported to the client as `status`."""
+
+  def __init__(self, status, message):
+    super().__init__(message)
+    self.status = status
+
+
+class LruCache:
+  """Least recently used cache of computed responses."""
+
+  def __init__(self, max_size):
+    self._max_size = max_size
+    self._entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self._entries)
+
+  def get(self, key, compute):
+    """Return the cached value for `key`, calling `compute()` on a miss."""
+    if key in self._entries:
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return self._entries[key]
+    self.misses += 1
+    value = compute()
+    self._entries[key] = value
+    if len(self._entries) > self._max_size:
+      self._entries.popitem(last=False)
+    return value
+
+  def clear(self):
+    """Drop all entries, e.g. after the underlying data changed."""
+    self._entries.clear()
+
+
+def to_json_value(value):
+  """Convert numpy/pandas scalars to JSON values, with NaN and inf as null."""
+  if isinstance(value, numpy.generic):
+    value = value.item()
+  # JSON has no NaN or Infinity, e.g. from a division by a zero population.
+  if isinstance(value, float) and not math.isfinite(value):
+    return None
+  return value
+
+
+class CityTable:
+  """Immutable snapshot of the joined table, indexed by (state, city)."""
+
+  def __init__(self, data_table, mtime):
+    self.data_table = data_table
+    self.mtime = mtime
+    data = data_table.data
+    state_key = data_table.get_state_key()
+    city_key = data_table.get_city_key()
+    self._numeric_columns = list(data.select_dtypes('number').columns)
+    # Row position of the first row of each (state, city).
+    self._positions = {}
+    for position, key in enumerate(zip(data[state_key], data[city_key])):
+      self._positions.setdefault(key, position)
+    self._state_key = state_key
+
+  def city(self, state, city):
+    """All fields of one city, as a dict."""
+    position = self._positions.get((state, city))
+    if position is None:
+      raise RequestError(404, 'unknown city: {}, {}'.format(city, state))
+    row = self.data_table.data.iloc[position]
+    return {column: to_json_value(value) for column, value in row.items()}
+
+  def compare(self, state_a, city_a, state_b, city_b):
+    """Both cities, and the difference (b - a) of their numeric fields."""
+    row_a = self.city(state_a, city_a)
+    row_b = self.city(state_b, city_b)
+    difference = {}
+    for column in self._numeric_columns:
+      if row_a[column] is not None and row_b[column] is not None:
+        difference[column] = row_b[column] - row_a[column]
+    return {'a': row_a, 'b': row_b, 'difference': difference}
+
+  def state(self, state):
+    """Number of cities, and sums and means of numeric fields, in a state."""
+    data = self.data_table.data
+    rows = data[data[self._state_key] == state][self._numeric_columns]
+    if rows.empty:
+      raise RequestError(404, 'unknown state: {}'.format(state))
+    return {
+      'state': state,
+      'cities': len(rows),
+      'sum': {
+        column: to_json_value(value) for column, value in rows.sum().items()
+      },
+      'mean': {
+        column: to_json_value(value) for column, value in rows.mean().items()
+      },
+    }
+
+
+def load_city_table(file_path):
+  """Read the joined CSV written by join_cities_csv into a CityTable.
+
+  Raises:
+    ValidationError: the table doesn't match CITY_TABLE_SCHEMA or is empty.
+  """
+  mtime = os.stat(file_path).st_mtime_ns
+  # join_cities_csv writes the CSV as UTF-8.
+  data = pandas.read_csv(file_path, encoding='utf-8', index_col=0)
+  problems = find_problems(data, CITY_TABLE_SCHEMA)
+  if data.empty:
+    problems.append('no rows')
+  if problems:
+    raise ValidationError('City table read from {}'.format(file_path), problems)
+  return CityTable(Census(data=data), mtime)
+
+
+class CityComparisonServer:
+  """Serve lookups over the joined table in `file_path`."""
+
+  # pylint: disable=too-many-instance-attributes
+
+  def __init__(self, file_path, cache_size=1024, poll_interval=1.0):
+    """
+    Args:
+      file_path: String path to the joined CSV.
+      cache_size: (Optional Integer) number of responses to cache.
+      poll_interval: (Optional Float) seconds between checks for a changed
+        file.
+    """
+    self._file_path = file_path
+    self._poll_interval = poll_interval
+    self._cache = LruCache(cache_size)
+    self._table = load_city_table(file_path)
+    self._server = None
+    self._reload_task = None
+    # Modification time of the last file rejected by validation, so it isn't
+    # reloaded on every poll.
+    self._rejected_mtime = None
+    self.reloads = 0
+    self.rejected_reloads = 0
+
+  async def start(self, host='127.0.0.1', port=0, unix_socket=None):
+    """Start listening on `host`:`port`, or on `unix_socket` if given."""
+    if unix_socket is not None:
+      self._server = await asyncio.start_unix_server(self._handle_connection,
+                                                     path=unix_socket)
+    else:
+      self._server = await asyncio.start_server(self._handle_connection,
+                                                host=host,
+                                                port=port)
+    self._reload_task = asyncio.ensure_future(self._watch_file())
+    return self._server.sockets[0].getsockname()
+
+  async def close(self):
+    """Stop listening and watching the file."""
+    self._reload_task.cancel()
+    self._server.close()
+    await self._server.wait_closed()
+
+  async def serve_forever(self):
+    """Serve until cancelled."""
+    async with self._server:
+      await self._server.serve_forever()
+
+  async def _watch_file(self):
+    """Reload the table whenever the file's modification time changes.
+
+    Replace the file atomically (write a new file, then rename it over the old
+    one, like join_cities_csv does) so a reload never sees a partially written
+    table.  A table that fails validation keeps the current one in service.
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+      await asyncio.sleep(self._poll_interval)
+      try:
+        mtime = os.stat(self._file_path).st_mtime_ns
+        if mtime in (self._table.mtime, self._rejected_mtime):
+          continue
+        # Load in a thread so requests keep being answered from the current
+        # table in the meantime.
+        table = await loop.run_in_executor(None, load_city_table,
+                                           self._file_path)
+      except ValidationError as error:
+        print('Not reloading {}: {}'.format(self._file_path, error),
+              file=sys.stderr)
+        self._rejected_mtime = mtime
+        self.rejected_reloads += 1
+        continue
+      except Exception as error:  # pylint: disable=broad-except
+        # E.g. the file is being rewritten.  Keep serving the current table
+        # and try again next time.
+        print('Reloading {} failed: {}'.format(self._file_path, error),
+              file=sys.stderr)
+        continue
+      self._table = table
+      self._cache.clear()
+      self.reloads += 1
+
+  def respond(self, path):
+    """Compute the (status, JSON body) response for a GET of `path`."""
+    url = urlsplit(path)
+    params = {key: values[0] for key, values in parse_qs(url.query).items()}
+    table = self._table
+
+    def param(name):
+      if name not in params:
+        raise RequestError(400, 'missing parameter: {}'.format(name))
+      return params[name].lower()
+
+    try:
+      if url.path == '/stats':
+        body = {
+          'rows': len(table.data_table.data),
+          'reloads': self.reloads,
+          'rejected_reloads': self.rejected_reloads,
+          'cache_size': len(self._cache),
+          'cache_hits': self._cache.hits,
+          'cache_misses': self._cache.misses,
+        }
+      elif url.path == '/city':
+        key = ('city', param('state'), param('city'))
+        body = self._cache.get(key, lambda: table.city(*key[1:]))
+      elif url.path == '/compare':
+        key = ('compare', param('state_a'), param('city_a'), param('state_b'),
+               param('city_b'))
+        body = self._cache.get(key, lambda: table.compare(*key[1:]))
+      elif url.path == '/state':
+        key = ('state', param('state'))
+        body = self._cache.get(key, lambda: table.state(*key[1:]))
+      else:
+        raise RequestError(404, 'unknown path: {}'.format(url.path))
+    except RequestError as error:
+      return error.status, {'error': str(error)}
+    return 200, body
+
+  @staticmethod
+  async def _read_request_line(reader):
+    """Read the request line's words and skip the headers.
+
+    Returns:
+      List of strings, or None if a line is longer than the reader's limit.
+    """
+    try:
+      request_line = (await reader.readline()).decode('latin-1').split()
+      # Skip the headers, we don't use any.
+      while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+        pass
+    except (ValueError, asyncio.LimitOverrunError):
+      return None
+    return request_line
+
+  def _answer(self, request_line):
+    """Compute the (status, JSON payload bytes) response to a request line."""
+    if request_line is None or len(request_line) != 3:
+      status, body = 400, {'error': 'malformed request'}
+    elif request_line[0] != 'GET':
+      status, body = 405, {'error': 'only GET is supported'}
+    else:
+      try:
+        status, body = self.respond(request_line[1])
+        return status, json.dumps(body, allow_nan=False).encode('utf-8')
+      except Exception as error:  # pylint: disable=broad-except
+        # Answer rather than drop the connection, and keep serving.
+        print('Answering {} failed: {!r}'.format(request_line[1], error),
+              file=sys.stderr)
+        status, body = 500, {'error': 'internal error'}
+    return status, json.dumps(body).encode('utf-8')
+
+  async def _handle_connection(self, reader, writer):
+    """Answer one HTTP/1.1 request, then close the connection."""
+    try:
+      request_line = await self._read_request_line(reader)
+      status, payload = self._answer(request_line)
+      writer.write('HTTP/1.1 {} {}\r\n'
+                   'Content-Type: application/json\r\n'
+                   'Content-Length: {}\r\n'
+                   'Connection: close\r\n\r\n'.format(
+                     status, REASONS[status], len(payload)).encode('latin-1'))
+      writer.write(payload)
+      await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      writer.close()
+
+
+async def serve(file_path, host='127.0.0.1', port=8080, unix_socket=None):
+  """Run a CityComparisonServer until interrupted."""
+  server = CityComparisonServer(file_path)
+  address = await server.start(host=host, port=port, unix_socket=unix_socket)
+  print('Serving {} on {}'.format(file_path, address), file=sys.stderr)
+  await server.serve_forever()
@@ -1,35 +1,30 @@
-""" Merge 3 seperate csv files from experian into one combined csv. """
+""" Merge seperate csv files from experian into one combined csv. """
 
-from pandas import read_csv
+import os
+import sys
 
+sys.path.insert(
+  0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+# pylint: disable=wrong-import-position
+from data_table_experian import merge_ranked_lists  # noqa: E402
 
-def merge_experian_data():
-  cities_worst_credit_score_filename = '500_cities_worst_credit_score.csv'
-  cities_worst_credit_score = read_csv(cities_worst_credit_score_filename,
-                                       encoding='ISO-8859-1')
+EXPERIAN_DIR = os.path.dirname(os.path.abspath(__file__))
 
-  cities_worst_credit_score = cities_worst_credit_score.drop('Rank', 1)
+RANKED_LIST_FILENAMES = [
+  '500_cities_worst_credit_score.csv', '500_cities_best_credit_score.csv',
+  '100_biggest_cities_best_credit_score.csv'
+]
 
-  cities_best_credit_score_filename = '500_cities_best_credit_score.csv'
-  cities_best_credit_score = read_csv(cities_best_credit_score_filename,
-                                      encoding='ISO-8859-1')
-  cities_best_credit_score = cities_best_credit_score.drop('Rank', 1)
 
-  biggest_cities_best_credit_score_filename = '100_biggest_cities_best_credit_score.csv'
-  biggest_cities_best_credit_score = read_csv(
-    biggest_cities_best_credit_score_filename, encoding='ISO-8859-1')
-  biggest_cities_best_credit_score = biggest_cities_best_credit_score.drop(
-    'Rank', 1)
+def merge_experian_data(filenames=None,
+                        output_filename='experian_combined_data.csv'):
+  """Merge ranked lists in data/experian and write out the combined CSV."""
+  filenames = filenames or RANKED_LIST_FILENAMES
+  all_cities_credit_scores = merge_ranked_lists(
+    [os.path.join(EXPERIAN_DIR, filename) for filename in filenames])
+  all_cities_credit_scores.to_csv(os.path.join(EXPERIAN_DIR, output_filename),
+                                  index=False)
 
-  cities_credit_score_best_and_worst = cities_worst_credit_score.merge(
-    cities_best_credit_score, on=['City', 'State', 'Credit Score'], how='outer')
 
-  all_cities_credit_scores = cities_credit_score_best_and_worst.merge(
-    biggest_cities_best_credit_score,
-    on=['City', 'State', 'Credit Score'],
-    how='outer')
-
-  all_cities_credit_scores.to_csv('experian_combined_data.csv', index=False)
-
-
-merge_experian_data()
+if __name__ == '__main__':
+  merge_experian_data(sys.argv[1:])
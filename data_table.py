@@ -5,15 +5,91 @@ We'll generalize to support joining other data tables in the future.
 
 from abc import ABC, abstractmethod
 import collections
+import os
+import tempfile
+import time
 import pandas
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from data_validation import validate
+import shared_data_table
 
 FuzzyMatchingKey = collections.namedtuple('FuzzyMatchingKey',
                                           ['state', 'city', 'population'])
 
+# Result of comparing two FuzzyMatchingKeys, see `compare_keys_with_branch`.
+KeyComparison = collections.namedtuple(
+  'KeyComparison', ['result', 'branch', 'population_percentage_difference'])
+
+
+def normalize_hash_key(values):
+  """Make keys that `merge` considers equal hash equally.
+
+  Hashes depend on dtype, e.g. 3 and 3.0 hash differently, but `merge` joins
+  int and float keys by value.  So numeric keys are hashed as float64, with
+  -0.0 turned into 0.0.
+
+  Args:
+    values: Pandas Series of key values.
+
+  Returns:
+    Pandas Series.
+  """
+  if is_numeric_dtype(values) and not is_bool_dtype(values):
+    return values.astype('float64') + 0.0
+  return values
+
+
+def _compare_keys(key1, key2):
+  """Fuzzy compare two FuzzyMatchingKeys, see `DataTable.compare_keys`.
+
+  Returns plain tuples of KeyComparison's fields, mostly constants, so that
+  `compare_keys` doesn't build a KeyComparison per comparison.
+  """
+  # pylint: disable=too-many-return-statements
+  # We assume the state names match identically.
+  if key1.state < key2.state:
+    return (-1, 'state_less', None)
+  if key1.state > key2.state:
+    return (1, 'state_greater', None)
+  # States are equal.  Now match cities.
+  if key1.city == key2.city:
+    # Assume cities with the same name are the same city.
+    return (0, 'city_equal', None)
+  # Is one city name prefix of the other?
+  shorter_city, longer_city = sorted([key1.city, key2.city], key=len)
+  # Without populations we can't sanity check a prefix match, so we only
+  # consider it when both populations are known.
+  has_populations = None not in (key1.population, key2.population)
+  if has_populations and longer_city.startswith(shorter_city):
+    # Might be the same city.
+    # Sanity check that populations are within 5% of each other.
+    population_percentage_difference = round(
+      abs(key1.population - key2.population) / key2.population * 100)
+    if population_percentage_difference > 10:
+      message = ('Population too different ({percent}%) to be the same city, '
+                 'continue:')
+      print(message.format(percent=population_percentage_difference), key1,
+            key2)
+      # Probably just a coincidence that the cities begin with the same name,
+      # if the populations are off by that much.
+      return (-1 if key1.city < key2.city else 1, 'prefix_population_rejected',
+              population_percentage_difference)
+    # Cities are probably a match because they are in same state, begin with
+    # the same prefix, have about the same population.
+    return (0, 'prefix_match', population_percentage_difference)
+  if key1.city < key2.city:
+    return (-1, 'city_less', None)
+  if key1.city > key2.city:
+    return (1, 'city_greater', None)
+  return (0, 'city_unordered', None)
+
 
 class DataTable(ABC):
   """Data table where each row is statistics for a city."""
 
+  # Number of partitions to split tables into for out of core exact matching.
+  NUM_HASH_PARTITIONS = 64
+
   def __init__(self, data=None, file_path=None, suffix=''):
     """
     Create a DataTable containing rows of city data.
@@ -29,6 +105,38 @@ class DataTable(ABC):
     else:
       assert self._file_path is not None
       self._data = self.__class__.read(self._file_path)
+      # Fail before any expensive join if the file isn't what we expect.
+      validate(
+        self._data, self.__class__.get_schema(),
+        '{} table read from {}'.format(self.__class__.__name__,
+                                       self._file_path))
+
+  def to_shared_memory(self):
+    """Copy this table into shared memory, to hand to other processes.
+
+    Returns:
+      shared_data_table.SharedDataTable.  Pass its picklable `handle` to other
+      processes and `close` it once they are done.
+    """
+    return shared_data_table.SharedDataTable(self)
+
+  @staticmethod
+  def from_shared_memory(handle):
+    """Attach to a table shared with `to_shared_memory`, without copying.
+
+    Numeric columns are read-only views of the shared memory.  String columns
+    are returned as ordered Categoricals of shared codes, which sort like the
+    original strings.  The views keep the shared memory mapped for as long as
+    they are used, even after the returned DataTable is gone.
+
+    Args:
+      handle: shared_data_table.SharedDataTableHandle.
+
+    Returns:
+      DataTable of the same class and suffix as the shared table.
+    """
+    return handle.table_class(data=shared_data_table.attach(handle),
+                              suffix=handle.suffix)
 
   @property
   def suffix(self):
@@ -45,6 +153,11 @@ class DataTable(ABC):
   def read(file_path):
     """Read data from file and return as pandas DataFrame."""
 
+  @staticmethod
+  @abstractmethod
+  def get_schema():
+    """data_validation.Schema that data returned by `read` must satisfy."""
+
   @staticmethod
   @abstractmethod
   def get_exact_matching_key():
@@ -84,82 +197,75 @@ class DataTable(ABC):
     Returns:
       FuzzyMatchingKey.
     """
+    population_key = cls.get_population_key()
+    population = row[population_key] if population_key is not None else None
     return FuzzyMatchingKey(state=row[cls.get_state_key()],
                             city=row[cls.get_city_key()],
-                            population=row[cls.get_population_key()])
+                            population=population)
+
+  @classmethod
+  def get_fuzzy_sort_keys(cls):
+    """Columns to sort by before fuzzy matching, skipping missing keys."""
+    keys = [cls.get_state_key(), cls.get_city_key(), cls.get_population_key()]
+    return [key for key in keys if key is not None]
 
   @staticmethod
   def compare_keys(key1, key2):
     """Comparison function for keys.
 
-    Perform fuzzy matching on keys.
+    Perform fuzzy matching on keys.  A key's population may be `None` if its
+    table doesn't report population.
 
     Returns:
       -1 if key1 < key2, 0 if key1 == key2, 1 if key1 > key2.
     """
-    # pylint: disable=too-many-return-statements
-    # We assume the state names match identically.
-    if key1.state < key2.state:
-      return -1
-    if key1.state > key2.state:
-      return 1
-    # States are equal.  Now match cities.
-    if key1.city == key2.city:
-      # Assume cities with the same name are the same city.
-      return 0
-    # Is one city name prefix of the other?
-    if (key1.city.startswith(key2.city)) or (key2.city.startswith(key1.city)):
-      # Might be the same city.
-      # Sanity check that populations are within 5% of each other.
-      population_percentage_difference = round(
-        abs(key1.population - key2.population) / key2.population * 100)
-      if population_percentage_difference > 10:
-        print(
-          'Population too different ({percent}%) to be the same city, continue:'
-          .format(percent=population_percentage_difference), key1, key2)
-        # Probably just a coincidence that the cities begin with the same name,
-        # if the populations are off by that much.
-        if key1.city < key2.city:
-          return -1
-        return 1
-      # Cities are probably a match because they are in same state, begin with
-      # the same prefix, have about the same population.
-      return 0
-    if key1.city < key2.city:
-      return -1
-    if key1.city > key2.city:
-      return 1
-    return 0
-
-  def join_fuzzy_matching(self, data_table):
+    return _compare_keys(key1, key2)[0]
+
+  @staticmethod
+  def compare_keys_with_branch(key1, key2):
+    """Like `compare_keys`, but also report how the keys were compared.
+
+    Returns:
+      KeyComparison.  `branch` names the check that decided `result`, and
+      `population_percentage_difference` is set when populations of a city
+      name prefix match were compared.
+    """
+    return KeyComparison._make(_compare_keys(key1, key2))
+
+  def join_fuzzy_matching(self, data_table, profiler=None, how='inner'):
     """Join with another DataTable of different type using fuzzy matching.
 
-    We perform an 'inner' join, so rows that do not match will not be returned.
+    By default we perform an 'inner' join, so rows that do not match will not
+    be returned.
 
     Args:
       data_table: DataTable.
+      profiler: (Optional) join_profiler.JoinProfiler to record where the join
+        spends its time and which `compare_keys` branches are taken.
+      how: (Optional String) 'inner', or 'left' to also return rows of this
+        table that don't match, with nulls in the columns of `data_table`.
+        Use 'left' for sources that only cover some cities.  NaNs are only
+        replaced with 0 for 'inner' joins, so that missing values stay
+        distinguishable from zeros.
 
     Returns:
       DataTable of same class as left hand table.
     """
     # pylint: disable=too-many-locals
-    keys_a = [
-      self.get_state_key(),
-      self.get_city_key(),
-      self.get_population_key()
-    ]
-    keys_b = [
-      data_table.get_state_key(),
-      data_table.get_city_key(),
-      data_table.get_population_key()
-    ]
+    assert how in ('inner', 'left')
+    clock = time.perf_counter
+    start = clock()
+    keys_a = self.get_fuzzy_sort_keys()
+    keys_b = data_table.get_fuzzy_sort_keys()
     rows_a = self._data.sort_values(by=keys_a)
     rows_b = data_table.data.sort_values(by=keys_b)
     rows_a.reset_index(inplace=True, drop=True)
     rows_b.reset_index(inplace=True, drop=True)
+    if profiler is not None:
+      profiler.add_time(['sort'], clock() - start)
     i_a = 0
     i_b = 0
-    merged_result = pandas.DataFrame()
+    merged_rows = []
     while i_a < len(rows_a) and i_b < len(rows_b):
       row_a = rows_a[i_a:i_a + 1]
       row_b = rows_b[i_b:i_b + 1]
@@ -168,18 +274,27 @@ class DataTable(ABC):
       row_a.reset_index(inplace=True, drop=True)
       row_b.reset_index(inplace=True, drop=True)
 
-      key_a = self.__class__.get_fuzzy_matching_key(row_a.iloc[0])
-      key_b = data_table.get_fuzzy_matching_key(row_b.iloc[0])
-      compare = DataTable.compare_keys(key_a, key_b)
+      # Without a profiler, stay off the clock and the KeyComparisons.
+      if profiler is None:
+        compare = DataTable.compare_keys(
+          self.__class__.get_fuzzy_matching_key(row_a.iloc[0]),
+          data_table.get_fuzzy_matching_key(row_b.iloc[0]))
+      else:
+        compare = self._profile_comparison(profiler, row_a.iloc[0], data_table,
+                                           row_b.iloc[0])
       if compare < 0:
         # row_a is too small to match row_b.
         # merged_result = merged_result.append(row_a, sort=True)
+        if how == 'left':
+          merged_rows.append(self._join_unmatched(row_a, data_table))
         i_a += 1
       elif compare > 0:
         # row_b is too small to match row_a:
         # merged_result = merged_result.append(row_b, sort=True)
         i_b += 1
       else:
+        if profiler is not None:
+          start = clock()
         # By joining `on=None`, we join on `index`, which is 0 for both `row_a`
         # and `row_b`.  If `row_a` and `row_b` have duplicate columns, suffixes
         # will be added.
@@ -189,20 +304,155 @@ class DataTable(ABC):
                                 lsuffix=self.suffix,
                                 rsuffix=data_table.suffix,
                                 sort=False)
-        merged_result = merged_result.append(merge_rows,
-                                             ignore_index=True,
-                                             sort=True)
+        merged_rows.append(merge_rows)
         i_a += 1
         i_b += 1
+        if profiler is not None:
+          profiler.add_time(['assemble_rows'], clock() - start)
 
+    start = clock()
+    if how == 'left' and i_a < len(rows_a):
+      # Rows of this table after the last row of `data_table` don't match.
+      merged_rows.append(self._join_unmatched(rows_a[i_a:], data_table))
+    merged_result = self._concat_rows(merged_rows, fill_nans=how == 'inner')
+    if profiler is not None:
+      profiler.add_time(['concat'], clock() - start)
+
+    return self.__class__(merged_result)
+
+  def _profile_comparison(self, profiler, row_a, data_table, row_b):
+    """Compare the keys of `row_a` and `row_b` (a row of `data_table`).
+
+    Records the time to extract and to compare the keys, and the comparison,
+    in `profiler`.
+
+    Returns:
+      Same as `compare_keys`.
+    """
+    start = time.perf_counter()
+    key_a = self.__class__.get_fuzzy_matching_key(row_a)
+    key_b = data_table.get_fuzzy_matching_key(row_b)
+    extracted = time.perf_counter()
+    comparison = DataTable.compare_keys_with_branch(key_a, key_b)
+    profiler.add_time(['extract_keys'], extracted - start)
+    profiler.add_comparison(comparison, time.perf_counter() - extracted)
+    return comparison.result
+
+  def _join_unmatched(self, rows, data_table):
+    """Add the columns of `data_table`, as nulls, to unmatched `rows`.
+
+    Joining with none of the rows of `data_table` gives unmatched rows of a
+    'left' join the same (suffixed) columns as matched rows.
+    """
+    return rows.join(data_table.data[0:0],
+                     how='left',
+                     lsuffix=self.suffix,
+                     rsuffix=data_table.suffix)
+
+  @staticmethod
+  def _concat_rows(merged_rows, fill_nans):
+    """Concatenate the rows joined by `join_fuzzy_matching` into a DataFrame."""
+    # Concatenate once at the end; appending row by row is quadratic.
+    if merged_rows:
+      merged_result = pandas.concat(merged_rows, ignore_index=True, sort=True)
+    else:
+      merged_result = pandas.DataFrame()
     # Drop the indices in `merged_result`, because they don't mean anything either.
     merged_result.reset_index(inplace=True, drop=True)
-    # NaNs are difficult to deal with.  Replace with 0 instead.
-    merged_result = merged_result.fillna(0)
+    if fill_nans:
+      # NaNs are difficult to deal with.  Replace with 0 instead.
+      merged_result = merged_result.fillna(0)
+    return merged_result
 
-    return self.__class__(merged_result)
+  def spill(self, directory, exact):
+    """Write this table to disk, split into partitions that join independently.
+
+    For fuzzy matching, rows are partitioned by state, since keys in different
+    states never match.  For exact matching, rows are partitioned by a hash of
+    the exact matching key.
 
-  def join(self, data_table):
+    Args:
+      directory: String path to directory to write partition files to.
+      exact: Boolean, whether partitions are for exact matching.
+
+    Returns:
+      Dict from partition value to partition file path.
+    """
+    if exact:
+      key = self.__class__.get_exact_matching_key()
+      keys = self._data[key]
+      if isinstance(keys, pandas.DataFrame):
+        keys = keys.apply(normalize_hash_key)
+      else:
+        keys = normalize_hash_key(keys)
+      partitions = pandas.util.hash_pandas_object(
+        keys, index=False) % self.NUM_HASH_PARTITIONS
+    else:
+      partitions = self._data[self.get_state_key()]
+    os.makedirs(directory, exist_ok=True)
+    partition_paths = {}
+    for i, (partition, rows) in enumerate(self._data.groupby(partitions)):
+      partition_paths[partition] = os.path.join(directory,
+                                                '{}.pickle'.format(i))
+      rows.to_pickle(partition_paths[partition])
+    return partition_paths
+
+  def join_out_of_core(self, data_table, spill_dir=None, output_file=None):
+    """Join with another DataTable one partition at a time.
+
+    Both tables are spilled to disk with `spill`, then partitions are loaded
+    and joined in pairs, so the join's working set (sorted copies, matched
+    rows) is bounded by the largest partition rather than the whole table.
+
+    Args:
+      data_table: DataTable.
+      spill_dir: (Optional String) directory to create the temporary partition
+        files in.  Defaults to the system temporary directory.
+      output_file: (Optional String) CSV file path.  If given, each partition's
+        result is appended to it as soon as it's joined, instead of being kept
+        in memory.
+
+    Returns:
+      DataTable, or None if `output_file` is given.
+    """
+    exact = isinstance(data_table, self.__class__)
+    results = []
+    num_rows = 0
+    with tempfile.TemporaryDirectory(dir=spill_dir) as directory:
+      paths_a = self.spill(os.path.join(directory, 'a'), exact)
+      paths_b = data_table.spill(os.path.join(directory, 'b'), exact)
+      for partition in sorted(paths_a.keys() & paths_b.keys()):
+        table_a = self.__class__(pandas.read_pickle(paths_a[partition]),
+                                 suffix=self.suffix)
+        table_b = data_table.__class__(pandas.read_pickle(paths_b[partition]),
+                                       suffix=data_table.suffix)
+        result = table_a.join(table_b).data
+        if result.empty:
+          continue
+        # Number rows consecutively across partitions, as if joined at once.
+        result.index = pandas.RangeIndex(num_rows, num_rows + len(result))
+        if output_file is not None:
+          result.to_csv(output_file,
+                        mode='w' if num_rows == 0 else 'a',
+                        header=num_rows == 0)
+        else:
+          results.append(result)
+        num_rows += len(result)
+    if output_file is not None:
+      if num_rows == 0:
+        # Nothing matched, but still leave an (empty) output file.
+        with open(output_file, 'w', encoding='utf-8'):
+          pass
+      return None
+    if not results:
+      return self.__class__(pandas.DataFrame())
+    return self.__class__(pandas.concat(results))
+
+  def join(self,
+           data_table,
+           out_of_core=False,
+           spill_dir=None,
+           output_file=None):
     """Join with another DataTable.
 
     Dispatches to use either "exact" or "fuzzy" matching based on whether
@@ -210,10 +460,20 @@ class DataTable(ABC):
 
     Args:
       data_table: DataTable.
+      out_of_core: (Optional Boolean) join partition by partition through
+        files on disk, for tables too large to join in memory.  See
+        `join_out_of_core`.
+      spill_dir: (Optional String) directory for out of core partition files.
+      output_file: (Optional String) CSV file path to stream out of core
+        results to.
 
     Returns:
-      DataTable.
+      DataTable, or None if results were streamed to `output_file`.
     """
+    if out_of_core:
+      return self.join_out_of_core(data_table,
+                                   spill_dir=spill_dir,
+                                   output_file=output_file)
 
     # If same class, join exact.
     if isinstance(data_table, self.__class__):
@@ -3,9 +3,15 @@ Module for parsing any Census related data in data/census.
 """
 import pandas
 from data_table import DataTable
+from data_validation import Schema
 from headers_cleanup import HEADERS_CHANGE
 
 
+def parse_city_name(name):
+  """Normalize a Census place name, e.g. 'New York city' => 'new york'."""
+  return name.lower().rstrip(' city')
+
+
 class Census(DataTable):
   """Table of Census data."""
 
@@ -27,14 +33,31 @@ class Census(DataTable):
     if 'Geography.2' in data:
 
       def parse_city_and_state(row):
-        city, state = row['Geography.2'].lower().split(', ')
-        city = city.rstrip(' city')
-        return pandas.Series([city, state])
+        city, state = row['Geography.2'].split(', ')
+        return pandas.Series([parse_city_name(city), state.lower()])
 
       data[['city', 'state']] = data.apply(parse_city_and_state, axis=1)
 
     return data
 
+  @staticmethod
+  def get_schema():
+    # The population and geography files share only the geography id.
+    # 'city' and 'state', the fuzzy matching keys, are parsed from
+    # 'Geography.2', which only the population file has.  The geography file
+    # is only ever exact matched on the geography id, so they can't be
+    # required.  Where they are parsed, `read` always adds both, and they must
+    # not be null.
+    populations = [
+      'Population Estimate (as of July 1) - 2010',
+      'Population Estimate (as of July 1) - 2017'
+    ]
+    return Schema(required_columns=['Target Geo Id2'],
+                  numeric_columns=['Target Geo Id2'] + populations,
+                  non_null_columns=['Target Geo Id2', 'city', 'state'],
+                  positive_columns=populations,
+                  unique_keys=[['Target Geo Id2']])
+
   @staticmethod
   def get_exact_matching_key():
     return 'Target Geo Id2'
@@ -0,0 +1,96 @@
+"""
+Module for parsing any Experian related data in data/experian.
+"""
+import pandas
+from data_table import DataTable
+from data_validation import Schema
+
+# Columns that identify one entry of an Experian ranked list.  Every ranked
+# list shares these columns, so an outer merge on them is a set union.
+EXPERIAN_KEY_COLUMNS = ['City', 'State', 'Credit Score']
+
+
+def read_ranked_list(file_path):
+  """Read one Experian ranked-list CSV, dropping its list-specific rank.
+
+  Args:
+    file_path: String path to file.
+
+  Returns:
+    Pandas dataframe with columns `EXPERIAN_KEY_COLUMNS`.
+  """
+  # The files start with a UTF-8 byte order mark, which would otherwise end up
+  # in the name of the first ('Rank') column.
+  data = pandas.read_csv(file_path, encoding='utf-8-sig')
+  # Skip blank lines at the end of the lists.
+  return data[EXPERIAN_KEY_COLUMNS].dropna(how='all')
+
+
+def merge_ranked_lists(file_paths):
+  """Outer merge any number of Experian ranked lists in a single pass.
+
+  Chaining `merge(how='outer')` on all shared columns re-hashes the growing
+  result once per list.  Since the lists share all of their columns, the same
+  result is the deduplicated union of the lists, which we compute with one
+  concatenation and one hash-based `drop_duplicates`.
+
+  Args:
+    file_paths: List of string paths to ranked-list CSV files.
+
+  Returns:
+    Pandas dataframe with one row per distinct (city, state, credit score),
+    in order of first appearance.
+  """
+  data = pandas.concat([read_ranked_list(path) for path in file_paths],
+                       ignore_index=True)
+  data.drop_duplicates(subset=EXPERIAN_KEY_COLUMNS, inplace=True)
+  data.reset_index(inplace=True, drop=True)
+  return data
+
+
+class Experian(DataTable):
+  """Table of Experian credit score data."""
+
+  @staticmethod
+  def read(file_path):
+    """Experian data is stored as one or more ranked-list CSV files.
+
+    Args:
+      file_path: String path to file, or list of string paths to files which
+        are merged together.
+
+    Returns:
+      Pandas dataframe.
+    """
+    if isinstance(file_path, str):
+      file_path = [file_path]
+    data = merge_ranked_lists(file_path)
+    # Add lowercase 'city' and 'state' fields to match the other tables.
+    data['city'] = data['City'].str.lower()
+    data['state'] = data['State'].str.lower()
+    return data
+
+  @staticmethod
+  def get_schema():
+    return Schema(required_columns=EXPERIAN_KEY_COLUMNS + ['city', 'state'],
+                  numeric_columns=['Credit Score'],
+                  non_null_columns=EXPERIAN_KEY_COLUMNS + ['city', 'state'],
+                  positive_columns=['Credit Score'],
+                  unique_keys=[['state', 'city']])
+
+  @staticmethod
+  def get_exact_matching_key():
+    return ['state', 'city']
+
+  @staticmethod
+  def get_state_key():
+    return 'state'
+
+  @staticmethod
+  def get_city_key():
+    return 'city'
+
+  @staticmethod
+  def get_population_key():
+    # Experian ranked lists don't report population.
+    return None
@@ -3,6 +3,13 @@ Module for parsing any Fbi related data in data/Fbi.
 """
 import pandas
 from data_table import DataTable
+from data_validation import Schema
+
+CRIME_COLUMNS = [
+  'violent crime', 'murder and nonnegligent manslaughter', 'rape1', 'robbery',
+  'aggravated assault', 'property crime', 'burglary', 'larceny- theft',
+  'motor vehicle theft', 'arson2'
+]
 
 
 class Fbi(DataTable):
@@ -45,6 +52,17 @@ class Fbi(DataTable):
 
     return data
 
+  @staticmethod
+  def get_schema():
+    # The footnotes at the end of the table have no city or population, so
+    # only 'state' is always set.
+    key_columns = ['state', 'city', 'population']
+    return Schema(required_columns=key_columns + CRIME_COLUMNS,
+                  numeric_columns=['population'] + CRIME_COLUMNS,
+                  non_null_columns=['state'],
+                  positive_columns=['population'],
+                  unique_keys=[['state', 'city']])
+
   @staticmethod
   def get_exact_matching_key():
     # By returning `None` as key, we use `index` as key.
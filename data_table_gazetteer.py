@@ -0,0 +1,120 @@
+"""
+Module for parsing Census Gazetteer place data, which gives the location of
+each city.
+"""
+import pandas
+from data_table import DataTable
+from data_table_census import parse_city_name
+from data_validation import Schema
+
+# Map USPS state abbreviations to the lowercase state names used by the other
+# tables.
+STATE_NAMES = {
+  'AL': 'alabama',
+  'AK': 'alaska',
+  'AZ': 'arizona',
+  'AR': 'arkansas',
+  'CA': 'california',
+  'CO': 'colorado',
+  'CT': 'connecticut',
+  'DE': 'delaware',
+  'DC': 'district of columbia',
+  'FL': 'florida',
+  'GA': 'georgia',
+  'HI': 'hawaii',
+  'ID': 'idaho',
+  'IL': 'illinois',
+  'IN': 'indiana',
+  'IA': 'iowa',
+  'KS': 'kansas',
+  'KY': 'kentucky',
+  'LA': 'louisiana',
+  'ME': 'maine',
+  'MD': 'maryland',
+  'MA': 'massachusetts',
+  'MI': 'michigan',
+  'MN': 'minnesota',
+  'MS': 'mississippi',
+  'MO': 'missouri',
+  'MT': 'montana',
+  'NE': 'nebraska',
+  'NV': 'nevada',
+  'NH': 'new hampshire',
+  'NJ': 'new jersey',
+  'NM': 'new mexico',
+  'NY': 'new york',
+  'NC': 'north carolina',
+  'ND': 'north dakota',
+  'OH': 'ohio',
+  'OK': 'oklahoma',
+  'OR': 'oregon',
+  'PA': 'pennsylvania',
+  'RI': 'rhode island',
+  'SC': 'south carolina',
+  'SD': 'south dakota',
+  'TN': 'tennessee',
+  'TX': 'texas',
+  'UT': 'utah',
+  'VT': 'vermont',
+  'VA': 'virginia',
+  'WA': 'washington',
+  'WV': 'west virginia',
+  'WI': 'wisconsin',
+  'WY': 'wyoming',
+  'PR': 'puerto rico',
+}
+
+
+class Gazetteer(DataTable):
+  """Table of Census Gazetteer data: location and area of each place."""
+
+  @staticmethod
+  def read(file_path):
+    """Gazetteer data is stored as tab separated text.
+
+    Args:
+      file_path: String path to file, e.g. '2017_Gaz_place_national.txt'.
+
+    Returns:
+      Pandas dataframe.
+    """
+    data = pandas.read_csv(file_path,
+                           sep='\t',
+                           encoding='ISO-8859-1',
+                           dtype={'GEOID': str})
+    # The last header in the file is padded with whitespace.
+    data.rename(columns=lambda header: header.strip(), inplace=True)
+    location_columns = {'INTPTLAT': 'latitude', 'INTPTLONG': 'longitude'}
+    data.rename(columns=location_columns, inplace=True)
+    # Use the same 'city' and 'state' values as the Census tables, e.g.
+    # 'Sunnyvale city', 'CA' => 'sunnyvale', 'california'.
+    data['city'] = data['NAME'].map(parse_city_name)
+    data['state'] = data['USPS'].map(STATE_NAMES)
+    return data
+
+  @staticmethod
+  def get_schema():
+    columns = [
+      'GEOID', 'USPS', 'NAME', 'latitude', 'longitude', 'city', 'state'
+    ]
+    return Schema(required_columns=columns,
+                  numeric_columns=['latitude', 'longitude'],
+                  non_null_columns=['GEOID', 'state', 'latitude', 'longitude'],
+                  unique_keys=[['GEOID']])
+
+  @staticmethod
+  def get_exact_matching_key():
+    return 'GEOID'
+
+  @staticmethod
+  def get_state_key():
+    return 'state'
+
+  @staticmethod
+  def get_city_key():
+    return 'city'
+
+  @staticmethod
+  def get_population_key():
+    # The Gazetteer doesn't report population.
+    return None
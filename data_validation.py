@@ -0,0 +1,145 @@
+"""
+Schema and constraint checks for data tables, run right after reading a table
+so bad inputs fail before the expensive join.
+"""
+
+import collections
+from pandas.api.types import is_numeric_dtype
+
+# Expected shape of a table.  Apart from `required_columns`, checks only apply
+# to columns present in the table, so one schema can cover files that carry
+# different subsets of columns.
+#   required_columns: columns that must be present.
+#   numeric_columns: columns that must have a numeric dtype.
+#   non_null_columns: columns that must not contain nulls.
+#   positive_columns: numeric columns whose values must be > 0 (nulls allowed).
+#   unique_keys: lists of columns whose combined values must be unique.
+Schema = collections.namedtuple('Schema', [
+  'required_columns', 'numeric_columns', 'non_null_columns', 'positive_columns',
+  'unique_keys'
+])
+Schema.__new__.__defaults__ = ((),) * len(Schema._fields)
+
+# Number of offending rows to list per problem.
+MAX_EXAMPLE_ROWS = 5
+
+
+class ValidationError(ValueError):
+  """A table doesn't match its schema."""
+
+  def __init__(self, name, problems):
+    """
+    Args:
+      name: String describing the table, e.g. its class and file path.
+      problems: List of strings, one per failed check.
+    """
+    self.problems = problems
+    super().__init__('{} failed validation:\n  {}'.format(
+      name, '\n  '.join(problems)))
+
+
+def describe_rows(mask):
+  """Describe rows where boolean Series `mask` is True, e.g. '2 rows (3, 7)'."""
+  rows = mask.index[mask.to_numpy()]
+  examples = ', '.join(str(row) for row in rows[:MAX_EXAMPLE_ROWS])
+  if len(rows) > MAX_EXAMPLE_ROWS:
+    examples += ', ...'
+  return '{} rows ({})'.format(len(rows), examples)
+
+
+def check_required(data, schema):
+  """Required columns must be present."""
+  missing = [
+    column for column in schema.required_columns if column not in data.columns
+  ]
+  if missing:
+    return ['missing columns: {}'.format(missing)]
+  return []
+
+
+def check_unnamed(data, schema):  # pylint: disable=unused-argument
+  """Columns must have names."""
+  # Pandas names blank header cells 'Unnamed: <position>', which happens when
+  # the wrong row is used as header or empty columns weren't dropped.
+  unnamed = [
+    column for column in data.columns if str(column).startswith('Unnamed:')
+  ]
+  if unnamed:
+    return ['unnamed columns, is the header misaligned? {}'.format(unnamed)]
+  return []
+
+
+def check_numeric(data, schema):
+  """Numeric columns must have a numeric dtype."""
+  return [
+    '{!r} has dtype {}, expected numeric'.format(column, data[column].dtype)
+    for column in schema.numeric_columns
+    if column in data.columns and not is_numeric_dtype(data[column])
+  ]
+
+
+def check_non_null(data, schema):
+  """Non-null columns must not contain nulls."""
+  problems = []
+  for column in schema.non_null_columns:
+    if column in data.columns:
+      nulls = data[column].isnull()
+      if nulls.any():
+        problems.append('{!r} is null in {}'.format(column,
+                                                    describe_rows(nulls)))
+  return problems
+
+
+def check_positive(data, schema):
+  """Positive columns must only contain values > 0 (or nulls)."""
+  problems = []
+  for column in schema.positive_columns:
+    # Non-numeric columns are reported by `check_numeric`.  Nulls compare as
+    # False, so they don't count as non-positive.
+    if column in data.columns and is_numeric_dtype(data[column]):
+      non_positive = data[column] <= 0
+      if non_positive.any():
+        problems.append('{!r} is not positive in {}'.format(
+          column, describe_rows(non_positive)))
+  return problems
+
+
+def check_unique(data, schema):
+  """Unique keys must not be duplicated."""
+  problems = []
+  for key in schema.unique_keys:
+    if set(data.columns).issuperset(key):
+      duplicates = data.duplicated(subset=list(key), keep=False)
+      if duplicates.any():
+        problems.append('{} is duplicated in {}'.format(
+          list(key), describe_rows(duplicates)))
+  return problems
+
+
+# Checks run by `find_problems`, in order.  Each takes a pandas DataFrame and a
+# Schema and returns a list of strings describing problems.
+CHECKS = [
+  check_required, check_unnamed, check_numeric, check_non_null, check_positive,
+  check_unique
+]
+
+
+def find_problems(data, schema):
+  """Check pandas DataFrame `data` against `schema`.
+
+  Each check is a single vectorized operation over a column.
+
+  Returns:
+    List of strings describing failed checks, empty if `data` is valid.
+  """
+  problems = []
+  for check in CHECKS:
+    problems.extend(check(data, schema))
+  return problems
+
+
+def validate(data, schema, name):
+  """Raise ValidationError listing every failed check, if any."""
+  problems = find_problems(data, schema)
+  if problems:
+    raise ValidationError(name, problems)
@@ -33,9 +33,25 @@ HEADERS_CHANGE = {
       'Population Estimate (as of July 1) - 2016'
     ]
   },
+  'experian': {
+    'rename_columns': {
+      'Credit Score': 'credit score experian'
+    },
+    'drop_columns': ['City', 'State']
+  },
+  'gazetteer': {
+    'rename_columns': {},
+    'drop_columns': [
+      'USPS', 'GEOID', 'ANSICODE', 'NAME', 'LSAD', 'FUNCSTAT', 'ALAND',
+      'AWATER', 'ALAND_SQMI', 'AWATER_SQMI'
+    ]
+  },
   'final_csv': {
     'rename_columns': {},
-    'drop_columns': ['Target Geo Id2', 'state_fbi_crime']
+    'drop_columns': [
+      'Target Geo Id2', 'state_fbi_crime', 'city_experian', 'state_experian',
+      'city_gazetteer', 'state_gazetteer'
+    ]
   }
 }
 
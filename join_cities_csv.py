@@ -1,9 +1,13 @@
 """Join Census and FBI data into one combined pandas DataFrame."""
 
+import os
 import pandas
 from data_table_census import Census as census_data_table
+from data_table_experian import Experian as experian_data_table
 from data_table_fbi import Fbi as fbi_data_table
+from data_table_gazetteer import Gazetteer as gazetteer_data_table
 from headers_cleanup import cleanup_headers
+from spatial_index import SpatialIndex
 
 
 def debug_print_dataframe(data, num_rows=2, debug=False):
@@ -14,21 +18,97 @@ def debug_print_dataframe(data, num_rows=2, debug=False):
       print(data[:num_rows])
 
 
-def main():
-  """Join Census data with FBI data and write out CSV."""
-
-  # Set to True to print out 2 rows out of each dataframe.
-  debug = False
-
-  census_population_2017_table = census_data_table(
-    file_path='data/census/PEP_2017_PEPANNRSIP.US12A_with_ann.csv')
+def write_csv_atomically(data, output_file):
+  """Write pandas DataFrame `data` to `output_file` in one step.
+
+  The CSV is written next to `output_file` and then renamed over it, so a
+  reader like city_comparison_server sees either the old or the new file, never
+  a partially written one.
+  """
+  temp_file = output_file + '.tmp'
+  try:
+    data.to_csv(temp_file, encoding='utf-8')
+    os.replace(temp_file, output_file)
+  except BaseException:
+    if os.path.exists(temp_file):
+      os.remove(temp_file)
+    raise
+
+
+def read_experian_table(data_dir, debug=False):
+  """Read and merge the Experian credit score lists.
+
+  Args:
+    data_dir: String directory containing the source data.
+    debug: (Optional Boolean) print out 2 rows of the table.
+
+  Returns:
+    Experian DataTable.
+  """
+  experian_file_paths = [
+    os.path.join(data_dir, 'experian', filename) for filename in [
+      '500_cities_worst_credit_score.csv', '500_cities_best_credit_score.csv',
+      '100_biggest_cities_best_credit_score.csv'
+    ]
+  ]
+  experian_credit_score_table = experian_data_table(
+    file_path=experian_file_paths, suffix='_experian')
+  cleanup_headers('experian', experian_credit_score_table.data)
+  print('experian_credit_score_table.data: ',
+        len(experian_credit_score_table.data))
+  debug_print_dataframe(experian_credit_score_table.data, debug=debug)
+  return experian_credit_score_table
+
+
+def join_gazetteer_table(data_table, data_dir, debug=False):
+  """Left join the Gazetteer's city locations onto `data_table`.
+
+  The Gazetteer isn't committed, see data/README.md.  Without it `data_table`
+  is returned as is, without locations.
+
+  Args:
+    data_table: DataTable of cities.
+    data_dir: String directory containing the source data.
+    debug: (Optional Boolean) print out 2 rows of the Gazetteer table.
+
+  Returns:
+    DataTable.
+  """
+  gazetteer_file_path = os.path.join(data_dir, 'census',
+                                     '2017_Gaz_place_national.txt')
+  if not os.path.exists(gazetteer_file_path):
+    print('Skipping locations, {} not found.'.format(gazetteer_file_path))
+    return data_table
+  gazetteer_table = gazetteer_data_table(file_path=gazetteer_file_path,
+                                         suffix='_gazetteer')
+  cleanup_headers('gazetteer', gazetteer_table.data)
+  print('gazetteer_table.data: ', len(gazetteer_table.data))
+  debug_print_dataframe(gazetteer_table.data, debug=debug)
+  # Keep cities whose name doesn't match a Gazetteer place, without a location.
+  return data_table.join_fuzzy_matching(gazetteer_table, how='left')
+
+
+def main(data_dir='data',
+         output_file='city_comparison.csv',
+         index_file='city_comparison_index.pickle',
+         debug=False):
+  """Join Census data with FBI data and write out CSV.
+
+  Args:
+    data_dir: (Optional String) directory containing the source data.
+    output_file: (Optional String) path of the combined CSV to write.
+    index_file: (Optional String) path of the spatial index to write.
+    debug: (Optional Boolean) print out 2 rows out of each dataframe.
+  """
+  census_population_2017_table = census_data_table(file_path=os.path.join(
+    data_dir, 'census', 'PEP_2017_PEPANNRSIP.US12A_with_ann.csv'))
   cleanup_headers('census_2017', census_population_2017_table.data)
 
   print('census_population_2017_table.data:\n',
         len(census_population_2017_table.data))
 
-  census_geography_2010_table = census_data_table(
-    file_path='data/census/DEC_10_SF1_GCTPH1.US13PR_with_ann.csv')
+  census_geography_2010_table = census_data_table(file_path=os.path.join(
+    data_dir, 'census', 'DEC_10_SF1_GCTPH1.US13PR_with_ann.csv'))
   # Note, this mutates the panda dataframe headers on census_geography_2010_table.data.columns
   cleanup_headers('census_2010', census_geography_2010_table.data)
 
@@ -40,20 +120,36 @@ def main():
   print('combined_census_table.data:\n', len(combined_census_table.data))
   debug_print_dataframe(combined_census_table.data, debug=debug)
 
-  fbi_crime_table = fbi_data_table(
-    file_path=
-    'data/fbi/Table_8_Offenses_Known_to_Law_Enforcement_by_State_by_City_2017.xls',
-    suffix='_fbi_crime')
+  fbi_file_path = os.path.join(
+    data_dir, 'fbi',
+    'Table_8_Offenses_Known_to_Law_Enforcement_by_State_by_City_2017.xls')
+  fbi_crime_table = fbi_data_table(file_path=fbi_file_path, suffix='_fbi_crime')
   print('fbi_crime_table.data: ', len(fbi_crime_table.data))
   debug_print_dataframe(fbi_crime_table.data, debug=debug)
 
-  combined_table = combined_census_table.join(fbi_crime_table)
+  combined_census_fbi_table = combined_census_table.join(fbi_crime_table)
+  print('combined_census_fbi_table.data: ', len(combined_census_fbi_table.data))
+  debug_print_dataframe(combined_census_fbi_table.data, debug=debug)
+
+  # The Experian lists only cover some of the cities, so keep the others with
+  # a null credit score instead of dropping them.
+  combined_table = combined_census_fbi_table.join_fuzzy_matching(
+    read_experian_table(data_dir, debug=debug), how='left')
+  print('combined_census_fbi_experian_table.data: ', len(combined_table.data))
+  debug_print_dataframe(combined_table.data, debug=debug)
+
+  combined_table = join_gazetteer_table(combined_table, data_dir, debug=debug)
   print('combined_table.data: ', len(combined_table.data))
   debug_print_dataframe(combined_table.data, debug=debug)
   cleanup_headers('final_csv', combined_table.data)
 
   # Write the combined dataframe table to the final csv file.
-  combined_table.data.to_csv('city_comparison.csv')
+  write_csv_atomically(combined_table.data, output_file)
+  # Without the Gazetteer there are no locations to index.
+  if 'latitude' in combined_table.data:
+    # Save the spatial index with the rows it indexes, so it can be loaded
+    # without rebuilding it.
+    SpatialIndex(combined_table).save(index_file)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,89 @@
+"""
+Opt-in profiling of `DataTable.join_fuzzy_matching`.
+
+Pass a JoinProfiler to `join_fuzzy_matching` to count which `compare_keys`
+branch decides each comparison, histogram the population differences of
+city name prefix matches, and time the phases of the join separately.
+"""
+
+import bisect
+import collections
+
+# Root frame of the stacks written by `write_flamegraph`.
+ROOT_FRAME = 'join_fuzzy_matching'
+
+# Upper bounds (inclusive) of the population percentage difference buckets.
+# `compare_keys` rejects prefix matches that differ by more than 10%.
+POPULATION_BUCKETS = [0, 1, 2, 5, 10, 25, 50, 100]
+
+
+class JoinProfiler:
+  """Counters and timers for one or more fuzzy joins."""
+
+  def __init__(self):
+    # Tuple of frame names => total seconds.
+    self.times = collections.defaultdict(float)
+    # `compare_keys` branch name => number of comparisons it decided.
+    self.branch_counts = collections.Counter()
+    # Index into POPULATION_BUCKETS (len for overflow) => count.
+    self.population_histogram = collections.Counter()
+
+  def add_time(self, frames, seconds):
+    """Add `seconds` to the stack of frame names `frames`."""
+    self.times[tuple(frames)] += seconds
+
+  def add_comparison(self, comparison, seconds):
+    """Record a data_table.KeyComparison which took `seconds`."""
+    self.branch_counts[comparison.branch] += 1
+    self.add_time(['compare_keys', comparison.branch], seconds)
+    if comparison.population_percentage_difference is not None:
+      bucket = bisect.bisect_left(POPULATION_BUCKETS,
+                                  comparison.population_percentage_difference)
+      self.population_histogram[bucket] += 1
+
+  def summary(self):
+    """Human readable summary of the recorded counters and timers."""
+    lines = []
+    total_seconds = sum(self.times.values())
+    lines.append('Time ({:.1f} ms total):'.format(total_seconds * 1000))
+    phase_seconds = collections.defaultdict(float)
+    for frames, seconds in self.times.items():
+      phase_seconds[frames[0]] += seconds
+    for phase, seconds in sorted(phase_seconds.items(),
+                                 key=lambda item: -item[1]):
+      lines.append('  {:<28}{:>10.1f} ms {:>6.1f}%'.format(
+        phase, seconds * 1000, 100 * seconds / (total_seconds or 1)))
+    total_comparisons = sum(self.branch_counts.values())
+    lines.append(
+      'compare_keys branches ({} comparisons):'.format(total_comparisons))
+    for branch, count in self.branch_counts.most_common():
+      seconds = self.times[('compare_keys', branch)]
+      lines.append('  {:<28}{:>10} {:>6.1f}% {:>10.1f} ms'.format(
+        branch, count, 100 * count / total_comparisons, seconds * 1000))
+    lines.append('Population difference of city name prefix matches:')
+    for bucket, count in sorted(self.population_histogram.items()):
+      lines.append('  {:<28}{:>10}'.format(bucket_label(bucket), count))
+    return '\n'.join(lines)
+
+  def write_flamegraph(self, file_path):
+    """Write times as folded stacks, the input format of flamegraph.pl.
+
+    Each line is 'join_fuzzy_matching;<frame>;<frame> <microseconds>'.
+    """
+    with open(file_path, 'w', encoding='utf-8') as flamegraph_file:
+      for frames, seconds in sorted(self.times.items()):
+        flamegraph_file.write('{} {}\n'.format(';'.join((ROOT_FRAME,) + frames),
+                                               round(seconds * 1e6)))
+
+
+def bucket_label(bucket):
+  """Label for a population histogram bucket, e.g. '2-5%'."""
+  if bucket == 0:
+    return '0%'
+  if bucket == len(POPULATION_BUCKETS):
+    return '>{}%'.format(POPULATION_BUCKETS[-1])
+  low = POPULATION_BUCKETS[bucket - 1] + 1
+  high = POPULATION_BUCKETS[bucket]
+  if low == high:
+    return '{}%'.format(high)
+  return '{}-{}%'.format(low, high)
@@ -0,0 +1,221 @@
+"""
+Hand DataTables to worker processes through shared memory instead of pickling
+the underlying pandas DataFrame.
+
+The owning process copies each column into a `multiprocessing.shared_memory`
+segment once.  Workers receive a small picklable handle and map the segments
+as read-only numpy arrays, without copying or deserializing the data.
+
+String columns are the exception: they are shared as integer codes into their
+sorted distinct values, which are shared in a segment of their own.  Attaching
+maps the codes without copying, but has to turn the distinct values back into
+Python strings, so a nearly unique column like 'city' is still copied once.
+
+Each attached array keeps its own segment mapped, so views of it stay valid
+however long they outlive the DataTable they were attached to.
+"""
+
+import collections
+import sys
+from multiprocessing import shared_memory
+import numpy
+import pandas
+from pandas.api.types import infer_dtype
+
+# One column in shared memory.  String and other object columns can't be
+# mapped directly, so they are shared as integer codes into `categories` and
+# come back as ordered pandas Categoricals.  `categories` are sorted, so the
+# Categoricals sort like the original values, and are either SharedStrings or,
+# for other objects, a numpy array which travels in the handle.
+SharedColumn = collections.namedtuple(
+  'SharedColumn', ['name', 'segment_name', 'dtype', 'length', 'categories'])
+
+# Strings in shared memory: string i is the UTF-8 `data` between `offsets[i]`
+# and `offsets[i + 1]`.  Both are SharedColumns of numbers.
+SharedStrings = collections.namedtuple('SharedStrings', ['offsets', 'data'])
+
+# Picklable description of a DataTable in shared memory.  `index` is either a
+# (start, stop, step) tuple for a RangeIndex or a SharedColumn.
+SharedDataTableHandle = collections.namedtuple(
+  'SharedDataTableHandle', ['table_class', 'suffix', 'columns', 'index'])
+
+
+def _share_array(name, values, segments):
+  """Copy numpy array `values` into a new segment appended to `segments`."""
+  # Segments can't be empty, so allocate at least one byte.
+  segment = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+  segments.append(segment)
+  shared = numpy.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)
+  shared[:] = values
+  return SharedColumn(name=name,
+                      segment_name=segment.name,
+                      dtype=values.dtype.str,
+                      length=len(values),
+                      categories=None)
+
+
+def _share_column(name, values, segments):
+  """Share one column (or index) of values, returning a SharedColumn."""
+  values = pandas.Series(values)
+  dtype = values.dtype
+  if isinstance(dtype, numpy.dtype) and dtype.kind in 'biufcmM':
+    return _share_array(name, values.to_numpy(), segments)
+  string_dtypes = (pandas.CategoricalDtype, pandas.StringDtype)
+  if dtype != object and not isinstance(dtype, string_dtypes):
+    # E.g. nullable Int64 or timezone aware datetimes, which would come back
+    # as floats or objects.
+    raise TypeError(
+      "Can't share column {!r} of dtype {} without losing data, convert it to "
+      'a numpy dtype first'.format(name, dtype))
+  codes, categories = _factorize(values.to_numpy(dtype=object))
+  shared = _share_array(name, codes, segments)
+  return shared._replace(categories=_share_categories(categories, segments))
+
+
+def _factorize(values):
+  """Codes into the sorted distinct values, with -1 for missing values."""
+  # Sort the categories, so that sorting the attached column (e.g. to fuzzy
+  # match on it) gives the same order as sorting the original values.
+  if infer_dtype(values, skipna=True) != 'string':
+    return pandas.factorize(values, sort=True)
+  # pandas hashes strings up to the first NUL, which would merge 'a\x00' into
+  # 'a', so compare them as Python objects instead.
+  present = ~pandas.isna(values)
+  categories, inverse = numpy.unique(values[present], return_inverse=True)
+  codes = numpy.full(len(values), -1, dtype=numpy.intp)
+  codes[present] = inverse
+  return codes, categories
+
+
+def _share_categories(categories, segments):
+  """Share string categories, or return other categories as a numpy array."""
+  categories = numpy.asarray(categories, dtype=object)
+  if infer_dtype(categories, skipna=False) != 'string':
+    # E.g. mixed types, which can't be mapped.
+    return categories
+  # 'surrogatepass' round trips any Python string, even unpaired surrogates.
+  encoded = [value.encode('utf-8', 'surrogatepass') for value in categories]
+  offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+  numpy.cumsum([len(value) for value in encoded], out=offsets[1:])
+  data = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+  return SharedStrings(offsets=_share_array(None, offsets, segments),
+                       data=_share_array(None, data, segments))
+
+
+def _attach_segment(segment_name):
+  """Attach to an existing segment without taking ownership of it."""
+  if sys.version_info >= (3, 13):
+    # pylint: disable=unexpected-keyword-arg
+    return shared_memory.SharedMemory(name=segment_name, track=False)
+  # Before Python 3.13, attaching also registers the segment with the resource
+  # tracker.  That's harmless for workers started by `multiprocessing` from the
+  # owning process, since they share the owner's tracker.
+  return shared_memory.SharedMemory(name=segment_name)
+
+
+class _AttachedSegment:  # pylint: disable=too-few-public-methods
+  """Read-only numpy array interface to an attached segment.
+
+  Arrays made from it with `numpy.asarray` have it as their `base`, as do all
+  views of those arrays, so the segment stays mapped until the last of them is
+  garbage collected.
+  """
+
+  def __init__(self, column):
+    self._segment = _attach_segment(column.segment_name)
+    array = numpy.ndarray((column.length,),
+                          dtype=numpy.dtype(column.dtype),
+                          buffer=self._segment.buf)
+    # pylint: disable=no-member
+    self.__array_interface__ = dict(array.__array_interface__,
+                                    data=(array.ctypes.data, True))
+    # Don't hold on to the buffer, or the segment can't be closed once this is
+    # garbage collected.
+    del array
+
+
+def _attach_column(column):
+  """Map a SharedColumn as read-only values, without copying."""
+  array = numpy.asarray(_AttachedSegment(column))
+  if column.categories is None:
+    return array
+  categories = column.categories
+  if isinstance(categories, SharedStrings):
+    categories = _attach_strings(categories)
+  return pandas.Categorical.from_codes(array,
+                                       categories=categories,
+                                       ordered=True)
+
+
+def _attach_strings(strings):
+  """Copy SharedStrings into a numpy array of Python strings."""
+  offsets = _attach_column(strings.offsets)
+  data = _attach_column(strings.data).tobytes()
+  strings = [
+    data[start:stop].decode('utf-8', 'surrogatepass')
+    for start, stop in zip(offsets[:-1], offsets[1:])
+  ]
+  return numpy.array(strings, dtype=object)
+
+
+class SharedDataTable:
+  """A DataTable's columns, copied into shared memory by the owning process.
+
+  Pass `handle` to workers, which call `DataTable.from_shared_memory(handle)`.
+  The owner must keep this object open until the workers are done, then call
+  `close` (or use it as a context manager) to free the shared memory.
+  """
+
+  def __init__(self, data_table):
+    """Copy the columns and index of `data_table` into shared memory."""
+    self._segments = []
+    data = data_table.data
+    try:
+      columns = [
+        _share_column(name, data.iloc[:, i], self._segments)
+        for i, name in enumerate(data.columns)
+      ]
+      if isinstance(data.index, pandas.RangeIndex):
+        index = (data.index.start, data.index.stop, data.index.step)
+      else:
+        index = _share_column(data.index.name, data.index, self._segments)
+    except BaseException:
+      self.close()
+      raise
+    self.handle = SharedDataTableHandle(table_class=data_table.__class__,
+                                        suffix=data_table.suffix,
+                                        columns=columns,
+                                        index=index)
+
+  def close(self):
+    """Release and free the shared memory.  Attached tables become invalid."""
+    for segment in self._segments:
+      segment.close()
+      segment.unlink()
+    self._segments = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+def attach(handle):
+  """Map the columns described by a SharedDataTableHandle.
+
+  Returns:
+    pandas DataFrame of read-only views of the shared memory.
+  """
+  data = {i: _attach_column(column) for i, column in enumerate(handle.columns)}
+  if isinstance(handle.index, SharedColumn):
+    index = pandas.Index(_attach_column(handle.index),
+                         name=handle.index.name,
+                         copy=False)
+  else:
+    index = pandas.RangeIndex(*handle.index)
+  # `copy=False` keeps one block per column pointing into shared memory,
+  # instead of consolidating columns into new arrays.
+  frame = pandas.DataFrame(data, index=index, copy=False)
+  frame.columns = [column.name for column in handle.columns]
+  return frame
@@ -0,0 +1,144 @@
+"""
+Spatial index over a city DataTable, for "cities within 50 miles of X" and
+"closest k cities to X" queries.
+"""
+
+import pickle
+import numpy
+from scipy.spatial import cKDTree
+
+# Mean radius of the earth.
+EARTH_RADIUS_MILES = 3958.8
+
+DISTANCE_KEY = 'distance miles'
+
+
+def to_unit_vectors(latitudes, longitudes):
+  """Project latitude/longitude in degrees onto 3D points on the unit sphere.
+
+  Straight line (chord) distance between the points increases monotonically
+  with great circle distance, so a KD-tree over these points answers great
+  circle radius and nearest neighbor queries exactly.
+
+  Returns:
+    Numpy array of shape (n, 3).
+  """
+  latitudes = numpy.radians(numpy.asarray(latitudes, dtype=float))
+  longitudes = numpy.radians(numpy.asarray(longitudes, dtype=float))
+  return numpy.column_stack([
+    numpy.cos(latitudes) * numpy.cos(longitudes),
+    numpy.cos(latitudes) * numpy.sin(longitudes),
+    numpy.sin(latitudes)
+  ])
+
+
+def miles_to_chord(miles):
+  """Convert great circle distance to chord distance on the unit sphere."""
+  angle = numpy.minimum(
+    numpy.asarray(miles, dtype=float) / EARTH_RADIUS_MILES, numpy.pi)
+  return 2 * numpy.sin(angle / 2)
+
+
+def chord_to_miles(chord):
+  """Convert chord distance on the unit sphere to great circle distance."""
+  chord = numpy.minimum(numpy.asarray(chord, dtype=float), 2)
+  return 2 * numpy.arcsin(chord / 2) * EARTH_RADIUS_MILES
+
+
+class SpatialIndex:
+  """KD-tree over the locations of the rows of a DataTable."""
+
+  def __init__(self,
+               data_table,
+               latitude_key='latitude',
+               longitude_key='longitude'):
+    """Build the index.
+
+    Rows without a location are not indexed.
+
+    Args:
+      data_table: DataTable with latitude and longitude columns, in degrees.
+      latitude_key: (Optional String) name of the latitude column.
+      longitude_key: (Optional String) name of the longitude column.
+    """
+    data = data_table.data
+    located = data[latitude_key].notnull() & data[longitude_key].notnull()
+    self._data = data[located].reset_index(drop=True)
+    self._tree = cKDTree(
+      to_unit_vectors(self._data[latitude_key], self._data[longitude_key]))
+
+  @property
+  def data(self):
+    """Indexed rows as pandas DataFrame."""
+    return self._data
+
+  def _rows(self, positions, chords):
+    """Rows at `positions`, with a distance column, closest first."""
+    rows = self._data.iloc[positions].copy()
+    rows[DISTANCE_KEY] = chord_to_miles(chords)
+    return rows.sort_values(by=DISTANCE_KEY, kind='stable')
+
+  def query_radius(self, latitude, longitude, miles):
+    """Find rows within `miles` of a location.
+
+    Args:
+      latitude: Float, or list of floats for a batch of queries.
+      longitude: Float, or list of floats for a batch of queries.
+      miles: Float radius.
+
+    Returns:
+      Pandas DataFrame of matching rows with a 'distance miles' column, closest
+      first.  For a batch of queries, a list of DataFrames.
+    """
+    is_batch = numpy.ndim(latitude) > 0
+    points = to_unit_vectors(numpy.atleast_1d(latitude),
+                             numpy.atleast_1d(longitude))
+    neighbors = self._tree.query_ball_point(points, miles_to_chord(miles))
+    results = []
+    for point, positions in zip(points, neighbors):
+      chords = numpy.linalg.norm(self._tree.data[positions] - point, axis=1)
+      results.append(self._rows(positions, chords))
+    return results if is_batch else results[0]
+
+  def query_nearest(self, latitude, longitude, k=1):
+    """Find the `k` rows closest to a location.
+
+    Args:
+      latitude: Float, or list of floats for a batch of queries.
+      longitude: Float, or list of floats for a batch of queries.
+      k: Integer number of rows to return per query, at least 1.  Fewer rows
+        are returned if the index has fewer than `k` rows.
+
+    Returns:
+      Pandas DataFrame of the closest rows with a 'distance miles' column,
+      closest first.  For a batch of queries, a list of DataFrames.
+
+    Raises:
+      ValueError: if `k` is less than 1.
+    """
+    if k < 1:
+      raise ValueError('k must be at least 1, got {}'.format(k))
+    is_batch = numpy.ndim(latitude) > 0
+    points = to_unit_vectors(numpy.atleast_1d(latitude),
+                             numpy.atleast_1d(longitude))
+    if self._data.empty:
+      results = [self._rows([], []) for _ in points]
+      return results if is_batch else results[0]
+    k = min(k, len(self._data))
+    chords, positions = self._tree.query(points, k=[i + 1 for i in range(k)])
+    results = [
+      self._rows(row_positions, row_chords)
+      for row_positions, row_chords in zip(positions, chords)
+    ]
+    return results if is_batch else results[0]
+
+  def save(self, file_path):
+    """Save the index together with the indexed rows."""
+    with open(file_path, 'wb') as index_file:
+      pickle.dump(self, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+  @staticmethod
+  def load(file_path):
+    """Load an index saved by `save`, without rebuilding the KD-tree."""
+    with open(file_path, 'rb') as index_file:
+      return pickle.load(index_file)
@@ -0,0 +1,164 @@
+import city_comparison
+from data_table_gazetteer import Gazetteer as gazetteer_data_table
+from spatial_index import SpatialIndex
+
+import contextlib
+import io
+import os
+import pandas
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+CSV_TEXT = ('city,state,population\n'
+            'sunnyvale,california,100\n'
+            'montgomery,alabama,200\n'
+            'mountain view,california,300\n'
+            'ca\u00f1on city,colorado,400\n')
+
+EXPERIAN_FILE_PATH = 'data/experian/100_biggest_cities_best_credit_score.csv'
+
+
+class TestCityComparison(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.input_file = os.path.join(self.directory.name, 'cities.csv')
+    with open(self.input_file, 'w', encoding='utf-8') as csv_file:
+      csv_file.write(CSV_TEXT)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def run_main(self, argv):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      city_comparison.main(argv)
+    return output.getvalue()
+
+  def run_main_with_stderr(self, argv):
+    errors = io.StringIO()
+    with contextlib.redirect_stderr(errors):
+      output = self.run_main(argv)
+    return output, errors.getvalue()
+
+  def test_query_by_state(self):
+    output = self.run_main(
+      ['query', '--input', self.input_file, '--state', 'California'])
+    self.assertEqual(
+      output, 'city,state,population\n'
+      'sunnyvale,california,100\n'
+      'mountain view,california,300\n')
+
+  def test_query_columns(self):
+    output = self.run_main([
+      'query', '--input', self.input_file, '--city', 'montgomery', '--columns',
+      'population'
+    ])
+    self.assertEqual(output, 'population\n200\n')
+
+  def test_query_no_matches(self):
+    output = self.run_main(
+      ['query', '--input', self.input_file, '--city', 'avalon'])
+    self.assertEqual(output, '\n')
+
+  def test_query_non_ascii(self):
+    output = self.run_main(
+      ['query', '--input', self.input_file, '--city', 'Ca\u00f1on City'])
+    self.assertEqual(output,
+                     'city,state,population\nca\u00f1on city,colorado,400\n')
+
+  def test_query_near(self):
+    table = gazetteer_data_table(data=pandas.DataFrame({
+      'city': ['sunnyvale', 'mountain view', 'montgomery'],
+      'latitude': [37.3688, 37.3861, 32.3668],
+      'longitude': [-122.0363, -122.0839, -86.3000],
+    }))
+    index_file = os.path.join(self.directory.name, 'index.pickle')
+    SpatialIndex(table).save(index_file)
+    output = self.run_main([
+      'query', '--index', index_file, '--near', '37.37', '-122.04', '--miles',
+      '10', '--columns', 'city'
+    ])
+    self.assertEqual(output, 'city\nsunnyvale\nmountain view\n')
+    output = self.run_main([
+      'query', '--index', index_file, '--near', '32', '-86', '--k', '1',
+      '--columns', 'city'
+    ])
+    self.assertEqual(output, 'city\nmontgomery\n')
+
+  def test_ingest(self):
+    output_file = os.path.join(self.directory.name, 'experian.csv')
+    output = self.run_main(
+      ['ingest', 'experian', EXPERIAN_FILE_PATH, output_file])
+    self.assertEqual(output, '{}: 100 rows\n'.format(output_file))
+    with open(output_file, encoding='utf-8') as csv_file:
+      self.assertEqual(len(csv_file.readlines()), 101)
+
+  def test_ingest_extra_paths(self):
+    # Only Experian reads more than one file.
+    with self.assertRaises(SystemExit):
+      self.run_main_with_stderr(
+        ['ingest', 'census', 'a.csv', 'b.csv', 'census.csv'])
+    args = city_comparison.parse_args(
+      ['ingest', 'experian', 'a.csv', 'b.csv', 'experian.csv'])
+    self.assertEqual(args.file_paths, ['a.csv', 'b.csv'])
+
+  def test_join(self):
+    with mock.patch('join_cities_csv.main') as main:
+      self.run_main(['join', '--data-dir', 'source', '--output', 'out.csv'])
+    main.assert_called_once_with(data_dir='source',
+                                 output_file='out.csv',
+                                 index_file='city_comparison_index.pickle',
+                                 debug=False)
+
+  def test_bench(self):
+    _, errors = self.run_main_with_stderr(
+      ['bench', 'experian', EXPERIAN_FILE_PATH, '--repeat', '2'])
+    self.assertIn('read experian #2', errors)
+    self.assertIn('fuzzy join experian with experian #2', errors)
+
+  def test_bench_other_source(self):
+    flamegraph_file = os.path.join(self.directory.name, 'join.folded')
+    output, errors = self.run_main_with_stderr([
+      'bench', 'census', 'data/census/PEP_2017_PEPANNRSIP.US12A_with_ann.csv',
+      '--other-source', 'experian', '--other-file-paths', EXPERIAN_FILE_PATH,
+      '--repeat', '1', '--profile', flamegraph_file
+    ])
+    self.assertIn('fuzzy join census with experian #1', errors)
+    # Unlike a join with itself, not every comparison is an exact match.
+    self.assertIn('city_less', output)
+    self.assertIn('state_greater', output)
+    self.assertTrue(os.path.exists(flamegraph_file))
+
+  def test_bench_other_source_needs_file_paths(self):
+    with self.assertRaises(SystemExit):
+      self.run_main_with_stderr(
+        ['bench', 'census', 'census.csv', '--other-source', 'experian'])
+
+  def test_query_does_not_import_pandas(self):
+    script = ('import sys, city_comparison\n'
+              'city_comparison.main(sys.argv[1:])\n'
+              'assert "pandas" not in sys.modules\n')
+    subprocess.run(
+      [sys.executable, '-c', script, 'query', '--input', self.input_file],
+      check=True,
+      stdout=subprocess.DEVNULL)
+
+  def test_bench_reports_timing(self):
+    args = city_comparison.parse_args([
+      'bench', 'experian',
+      'data/experian/100_biggest_cities_best_credit_score.csv'
+    ])
+    self.assertTrue(args.timing)
+    self.assertEqual(args.function, city_comparison.bench)
+
+  def test_timing_off_by_default(self):
+    args = city_comparison.parse_args(['query'])
+    self.assertFalse(args.timing)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,247 @@
+from city_comparison_server import (CityComparisonServer, LruCache,
+                                    to_json_value)
+from join_cities_csv import write_csv_atomically
+
+import asyncio
+import io
+import json
+import numpy
+import os
+import pandas
+import tempfile
+import unittest
+from unittest import mock
+
+CSV_TEXT = (',city,state,population,violent crime\n'
+            '0,sunnyvale,california,100,10\n'
+            '1,mountain view,california,300,\n'
+            '2,montgomery,alabama,200,40\n'
+            '3,ca\u00f1on city,colorado,300,\n')
+
+
+async def get(address, path):
+  """Send a GET request to the server and return (status, JSON body)."""
+  if isinstance(address, str):
+    reader, writer = await asyncio.open_unix_connection(address)
+  else:
+    reader, writer = await asyncio.open_connection(*address[:2])
+  writer.write(
+    'GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n'.format(path).encode('latin-1'))
+  await writer.drain()
+  response = await reader.read()
+  writer.close()
+  head, body = response.split(b'\r\n\r\n', 1)
+  status = int(head.split()[1])
+  return status, json.loads(body.decode('utf-8'))
+
+
+class TestLruCache(unittest.TestCase):
+
+  def test_evicts_least_recently_used(self):
+    cache = LruCache(2)
+    cache.get('a', lambda: 1)
+    cache.get('b', lambda: 2)
+    cache.get('a', lambda: 0)
+    cache.get('c', lambda: 3)
+    self.assertEqual(cache.get('a', lambda: 0), 1)
+    self.assertEqual(cache.get('b', lambda: 0), 0)
+    self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+
+class TestToJsonValue(unittest.TestCase):
+
+  def test_non_finite_is_null(self):
+    self.assertEqual(to_json_value(numpy.int64(3)), 3)
+    self.assertEqual(to_json_value(numpy.float64('nan')), None)
+    self.assertEqual(to_json_value(numpy.float64('inf')), None)
+    self.assertEqual(to_json_value(float('-inf')), None)
+
+
+class TestCityComparisonServer(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_path = os.path.join(self.directory.name, 'city_comparison.csv')
+    with open(self.file_path, 'w', encoding='utf-8') as csv_file:
+      csv_file.write(CSV_TEXT)
+    self.mtime = os.stat(self.file_path).st_mtime_ns
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def replace_file(self, csv_text, seconds):
+    """Replace the file like join_cities_csv, `seconds` after the original."""
+    data = pandas.read_csv(io.StringIO(csv_text), index_col=0)
+    write_csv_atomically(data, self.file_path)
+    # Timestamps can be coarser than the time between writes.
+    os.utime(self.file_path, ns=(self.mtime, self.mtime + seconds * 10**9))
+
+  def run_with_server(self, test, unix_socket=None):
+    """Run coroutine function `test(server, address)` against a server."""
+
+    async def run():
+      server = CityComparisonServer(self.file_path, poll_interval=0.01)
+      address = await server.start(port=0, unix_socket=unix_socket)
+      try:
+        await test(server, address)
+      finally:
+        await server.close()
+
+    asyncio.run(run())
+
+  def test_city(self):
+
+    async def test(_, address):
+      status, body = await get(address, '/city?city=Sunnyvale&state=California')
+      self.assertEqual(status, 200)
+      self.assertEqual(
+        body, {
+          'city': 'sunnyvale',
+          'state': 'california',
+          'population': 100,
+          'violent crime': 10.0
+        })
+
+    self.run_with_server(test)
+
+  def test_city_non_ascii(self):
+
+    async def test(_, address):
+      status, body = await get(address,
+                               '/city?city=Ca%C3%B1on+City&state=colorado')
+      self.assertEqual(status, 200)
+      self.assertEqual(body['city'], 'ca\u00f1on city')
+
+    self.run_with_server(test)
+
+  def test_compare(self):
+
+    async def test(_, address):
+      status, body = await get(
+        address, '/compare?city_a=sunnyvale&state_a=california'
+        '&city_b=mountain+view&state_b=california')
+      self.assertEqual(status, 200)
+      self.assertEqual(body['a']['city'], 'sunnyvale')
+      self.assertEqual(body['b']['city'], 'mountain view')
+      self.assertEqual(body['b']['violent crime'], None)
+      self.assertEqual(body['difference'], {'population': 200})
+
+    self.run_with_server(test)
+
+  def test_state(self):
+
+    async def test(_, address):
+      status, body = await get(address, '/state?state=california')
+      self.assertEqual(status, 200)
+      self.assertEqual(body['cities'], 2)
+      self.assertEqual(body['sum'], {'population': 400, 'violent crime': 10.0})
+      self.assertEqual(body['mean'], {
+        'population': 200.0,
+        'violent crime': 10.0
+      })
+
+    self.run_with_server(test)
+
+  def test_errors(self):
+
+    async def test(_, address):
+      status, body = await get(address, '/city?city=avalon&state=california')
+      self.assertEqual((status, body), (404, {
+        'error': 'unknown city: avalon, california'
+      }))
+      status, body = await get(address, '/city?city=sunnyvale')
+      self.assertEqual((status, body), (400, {
+        'error': 'missing parameter: state'
+      }))
+      status, _ = await get(address, '/nowhere')
+      self.assertEqual(status, 404)
+
+    self.run_with_server(test)
+
+  def test_cache(self):
+
+    async def test(_, address):
+      for _ in range(3):
+        await get(address, '/state?state=california')
+      _, stats = await get(address, '/stats')
+      self.assertEqual((stats['cache_hits'], stats['cache_misses']), (2, 1))
+
+    self.run_with_server(test)
+
+  def test_reload(self):
+
+    async def test(server, address):
+      _, body = await get(address, '/state?state=alabama')
+      self.assertEqual(body['cities'], 1)
+      self.replace_file(CSV_TEXT + '4,mobile,alabama,50,5\n', 1)
+      for _ in range(100):
+        if server.reloads:
+          break
+        # Requests are still answered while reloading.
+        status, _ = await get(address, '/stats')
+        self.assertEqual(status, 200)
+        await asyncio.sleep(0.01)
+      self.assertEqual(server.reloads, 1)
+      _, body = await get(address, '/state?state=alabama')
+      self.assertEqual(body['cities'], 2)
+      _, stats = await get(address, '/stats')
+      self.assertEqual(stats['rows'], 5)
+
+    self.run_with_server(test)
+
+  def test_reload_rejects_invalid_table(self):
+
+    async def wait_for_rejected_reloads(server, count):
+      for _ in range(100):
+        if server.rejected_reloads == count:
+          break
+        await asyncio.sleep(0.01)
+      self.assertEqual(server.rejected_reloads, count)
+
+    async def test(server, address):
+      # No rows.
+      self.replace_file(CSV_TEXT.split('\n')[0], 1)
+      await wait_for_rejected_reloads(server, 1)
+      # No 'state' column.
+      self.replace_file(CSV_TEXT.replace('state', 'region'), 2)
+      await wait_for_rejected_reloads(server, 2)
+      _, stats = await get(address, '/stats')
+      self.assertEqual((stats['rows'], stats['reloads']), (4, 0))
+      status, _ = await get(address, '/city?city=montgomery&state=alabama')
+      self.assertEqual(status, 200)
+
+    self.run_with_server(test)
+
+  def test_request_line_too_long(self):
+
+    async def test(_, address):
+      status, body = await get(address, '/city?city=' + 'a' * 100000)
+      self.assertEqual((status, body), (400, {'error': 'malformed request'}))
+
+    self.run_with_server(test)
+
+  def test_internal_error(self):
+
+    async def test(server, address):
+      with mock.patch.object(server, 'respond', side_effect=KeyError('city')):
+        status, body = await get(address, '/city?city=a&state=b')
+      self.assertEqual((status, body), (500, {'error': 'internal error'}))
+      # The server keeps answering.
+      status, _ = await get(address, '/stats')
+      self.assertEqual(status, 200)
+
+    self.run_with_server(test)
+
+  def test_unix_socket(self):
+
+    async def test(_, address):
+      status, body = await get(address, '/city?city=montgomery&state=alabama')
+      self.assertEqual(status, 200)
+      self.assertEqual(body['population'], 200)
+
+    unix_socket = os.path.join(self.directory.name, 'server.sock')
+    self.run_with_server(test, unix_socket=unix_socket)
+
+
+if __name__ == '__main__':
+  unittest.main()
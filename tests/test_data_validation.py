@@ -0,0 +1,123 @@
+from data_table_census import Census as census_data_table
+from data_table_fbi import Fbi as fbi_data_table
+from data_validation import Schema, ValidationError, find_problems, validate
+
+import os
+import pandas
+import tempfile
+import unittest
+
+SCHEMA = Schema(required_columns=['state', 'city', 'population'],
+                numeric_columns=['population'],
+                non_null_columns=['state', 'city'],
+                positive_columns=['population'],
+                unique_keys=[['state', 'city']])
+
+
+class TestFindProblems(unittest.TestCase):
+
+  def test_valid(self):
+    df = pandas.DataFrame({
+      'state': ['CA', 'CA'],
+      'city': ['Sunnyvale', 'Mountain View'],
+      'population': [100, None],
+    })
+    self.assertEqual(find_problems(df, SCHEMA), [])
+
+  def test_missing_columns(self):
+    df = pandas.DataFrame({'state': ['CA'], 'Unnamed: 13': [None]})
+    self.assertEqual(find_problems(df, SCHEMA), [
+      "missing columns: ['city', 'population']",
+      "unnamed columns, is the header misaligned? ['Unnamed: 13']"
+    ])
+
+  def test_numeric(self):
+    df = pandas.DataFrame({
+      'state': ['CA'],
+      'city': ['Sunnyvale'],
+      'population': ['lots'],
+    })
+    problems = find_problems(df, SCHEMA)
+    self.assertEqual(len(problems), 1)
+    self.assertTrue(problems[0].startswith("'population' has dtype"))
+
+  def test_non_null(self):
+    df = pandas.DataFrame({
+      'state': ['CA', None, 'AL'],
+      'city': ['Sunnyvale', 'Lost City', 'Montgomery'],
+      'population': [100, 200, 300],
+    })
+    self.assertEqual(find_problems(df, SCHEMA),
+                     ["'state' is null in 1 rows (1)"])
+
+  def test_positive(self):
+    df = pandas.DataFrame({
+      'state': ['CA'] * 7,
+      'city': ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+      'population': [0, -1, 0, 0, 0, 0, 1],
+    })
+    self.assertEqual(
+      find_problems(df, SCHEMA),
+      ["'population' is not positive in 6 rows (0, 1, 2, 3, 4, ...)"])
+
+  def test_unique(self):
+    df = pandas.DataFrame({
+      'state': ['CA', 'CA', 'AL'],
+      'city': ['Sunnyvale', 'Sunnyvale', 'Sunnyvale'],
+      'population': [100, 200, 300],
+    })
+    self.assertEqual(find_problems(df, SCHEMA),
+                     ["['state', 'city'] is duplicated in 2 rows (0, 1)"])
+
+  def test_validate_raises(self):
+    df = pandas.DataFrame({'state': ['CA'], 'city': ['Sunnyvale']})
+    with self.assertRaises(ValidationError) as context:
+      validate(df, SCHEMA, 'Test table')
+    self.assertEqual(
+      str(context.exception), "Test table failed validation:\n"
+      "  missing columns: ['population']")
+    self.assertEqual(context.exception.problems,
+                     ["missing columns: ['population']"])
+
+
+class TestDataTableValidation(unittest.TestCase):
+
+  def test_fbi_schema(self):
+    # Footnote rows at the end of the FBI table only have 'state'.
+    df = pandas.DataFrame({
+      'state': ['alabama', 'alabama', ' the fbi determined ...'],
+      'city': ['abbeville', 'adamsville', None],
+      'population': [2567, 4335, None],
+    })
+    for column in [
+        'violent crime', 'murder and nonnegligent manslaughter', 'rape1',
+        'robbery', 'aggravated assault', 'property crime', 'burglary',
+        'larceny- theft', 'motor vehicle theft', 'arson2'
+    ]:
+      df[column] = [1, 2, None]
+    self.assertEqual(find_problems(df, fbi_data_table.get_schema()), [])
+
+  def test_init_from_file_validates(self):
+    with tempfile.TemporaryDirectory() as directory:
+      file_path = os.path.join(directory, 'census.csv')
+      with open(file_path, 'w') as census_file:
+        census_file.write(
+          'GEO.id,GEO.id2,GC_RANK.target-geo-id2,GEO.display-label,respop72017\n'
+          'Id,Id2,Target Geo Id2,Geography.2,'
+          'Population Estimate (as of July 1) - 2017\n'
+          '0100000US,,3651000,"New York city, New York",8622698\n'
+          '0100000US,,1714000,"Chicago city, Illinois",0\n')
+      with self.assertRaises(ValidationError) as context:
+        census_data_table(file_path=file_path)
+    self.assertEqual(context.exception.problems, [
+      "'Population Estimate (as of July 1) - 2017' is not positive in "
+      "1 rows (1)"
+    ])
+
+  def test_init_from_data_does_not_validate(self):
+    df = pandas.DataFrame({'foo': [1]})
+    self.assertTrue(census_data_table(data=df).data.equals(df))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,8 +1,12 @@
 from data_table_census import Census as census_data_table
 from data_table_fbi import Fbi as fbi_data_table
+from data_table_experian import Experian as experian_data_table
+from data_table_gazetteer import Gazetteer as gazetteer_data_table
 from data_table import FuzzyMatchingKey
 
+import os
 import pandas
+import tempfile
 import unittest
 from headers_cleanup import HEADERS_CHANGE
 
@@ -284,5 +288,269 @@ class TestFuzzyMatching(unittest.TestCase):
     self.assertTrue(expected_data.equals(actual_data))
 
 
+EXPERIAN_FILE_PATHS = [
+  'data/experian/500_cities_worst_credit_score.csv',
+  'data/experian/500_cities_best_credit_score.csv',
+  'data/experian/100_biggest_cities_best_credit_score.csv'
+]
+
+
+class TestExperian(unittest.TestCase):
+
+  def test_get_exact_matching_key(self):
+    self.assertEqual(experian_data_table.get_exact_matching_key(),
+                     ['state', 'city'])
+
+  def test_get_population_key(self):
+    self.assertIsNone(experian_data_table.get_population_key())
+
+  def test_get_fuzzy_matching_key(self):
+    df = pandas.DataFrame(
+      {
+        'state': 'california',
+        'city': 'sunnyvale',
+        'Credit Score': 700
+      },
+      index=[0])
+    experian_table = experian_data_table(data=df)
+    self.assertEqual(
+      experian_table.get_fuzzy_matching_key(df.iloc[0]),
+      FuzzyMatchingKey(state='california', city='sunnyvale', population=None))
+
+  def test_read_single_file(self):
+    df = experian_data_table.read(EXPERIAN_FILE_PATHS[2])
+    self.assertEqual(len(df), 100)
+    self.assertEqual(df['city'][0], 'littleton')
+    self.assertEqual(df['state'][0], 'colorado')
+
+  def test_read_merges_files(self):
+    # Cities that appear in more than one ranked list only appear once.
+    df = experian_data_table.read(EXPERIAN_FILE_PATHS)
+    self.assertEqual(len(df), 1064)
+    self.assertFalse(df.duplicated(['City', 'State', 'Credit Score']).any())
+
+  def test_read_matches_chained_outer_merge(self):
+    lists = [
+      pandas.read_csv(path, encoding='utf-8-sig').drop(
+        'Rank', axis=1).dropna(how='all') for path in EXPERIAN_FILE_PATHS
+    ]
+    expected = lists[0]
+    for ranked_list in lists[1:]:
+      expected = expected.merge(ranked_list,
+                                on=['City', 'State', 'Credit Score'],
+                                how='outer')
+    actual = experian_data_table.read(EXPERIAN_FILE_PATHS)
+    actual = actual[['City', 'State', 'Credit Score']]
+    self.assertEqual(set(expected.itertuples(index=False, name=None)),
+                     set(actual.itertuples(index=False, name=None)))
+
+  def test_compare_keys_prefix_without_population(self):
+    # Without population we can't confirm that a prefix is the same city.
+    key1 = FuzzyMatchingKey(state='CA', city='Sunnyvale City', population=100)
+    key2 = FuzzyMatchingKey(state='CA', city='Sunnyvale', population=None)
+    self.assertEqual(experian_data_table.compare_keys(key1, key2), 1)
+
+  def test_join_fuzzy_matching(self):
+    census_data = pandas.DataFrame(
+      {
+        'state': ['california', 'alabama'],
+        'city': ['sunnyvale', 'montgomery'],
+        'Target Geo Id2': ['1620000US0677000', '1620000US0151000'],
+        get_header('Population Estimate (as of July 1) - 2017', 'census_2017'):
+        [100, 200],
+      },
+      index=[0, 1])
+    experian_data = pandas.DataFrame(
+      {
+        'state': ['alabama', 'california', 'colorado'],
+        'city': ['montgomery', 'sunnyvale', 'littleton'],
+        'Credit Score': [650, 700, 745],
+      },
+      index=[0, 1, 2])
+    census_table = census_data_table(data=census_data)
+    experian_table = experian_data_table(data=experian_data,
+                                         suffix='_experian')
+    joined_table = census_table.join(experian_table)
+    self.assertTrue(isinstance(joined_table, census_data_table))
+    actual_data = joined_table.data.sort_index(axis=1)
+    expected_data = pandas.DataFrame({
+      'state': ['alabama', 'california'],
+      'city': ['montgomery', 'sunnyvale'],
+      'Target Geo Id2': ['1620000US0151000', '1620000US0677000'],
+      get_header('Population Estimate (as of July 1) - 2017', 'census_2017'):
+      [200, 100],
+      'state_experian': ['alabama', 'california'],
+      'city_experian': ['montgomery', 'sunnyvale'],
+      'Credit Score': [650, 700],
+    }).sort_index(axis=1)
+    self.assertTrue(expected_data.equals(actual_data))
+
+  def test_join_fuzzy_matching_left(self):
+    census_data = pandas.DataFrame(
+      {
+        'state': ['california', 'alabama', 'wyoming', 'california'],
+        'city': ['sunnyvale', 'montgomery', 'cheyenne', 'avalon'],
+        get_header('Population Estimate (as of July 1) - 2017', 'census_2017'):
+        [100, 200, 300, 0],
+      },
+      index=[0, 1, 2, 3])
+    experian_data = pandas.DataFrame(
+      {
+        'state': ['alabama', 'california', 'colorado'],
+        'city': ['montgomery', 'sunnyvale', 'littleton'],
+        'Credit Score': [650, 700, 745],
+      },
+      index=[0, 1, 2])
+    census_table = census_data_table(data=census_data, suffix='_census')
+    experian_table = experian_data_table(data=experian_data,
+                                         suffix='_experian')
+    joined_table = census_table.join_fuzzy_matching(experian_table,
+                                                    how='left')
+    actual_data = joined_table.data
+    # Cities without a credit score are kept, with nulls instead of 0.
+    self.assertEqual(actual_data['city_census'].tolist(),
+                     ['montgomery', 'avalon', 'sunnyvale', 'cheyenne'])
+    self.assertEqual(actual_data['city_experian'].isnull().tolist(),
+                     [False, True, False, True])
+    self.assertEqual(actual_data['Credit Score'].fillna(-1).tolist(),
+                     [650, -1, 700, -1])
+
+
+class TestOutOfCoreJoin(unittest.TestCase):
+
+  def test_join_fuzzy_matching_same_as_in_memory(self):
+    fbi_data = pandas.DataFrame({
+      'foo': [1, 2, 3, 4],
+      'state': ['CA', 'AL', 'Hidden', 'CA'],
+      'city': ['Sunnyvale', 'Montgomery', 'Lost City', 'Mountain View'],
+      'population': [100, 200, 300, 400],
+    })
+    census_data = pandas.DataFrame({
+      'bar': [5, 3, 4, 6],
+      'state': ['Isle of Man', 'AL', 'CA', 'CA'],
+      'city': ['Avalon', 'Montgomery', 'Sunnyvale', 'Mountain View'],
+      get_header('Population Estimate (as of July 1) - 2017', 'census_2017'):
+      [1, 200, 100, 401],
+    })
+    fbi_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    census_table = census_data_table(data=census_data, suffix='_census')
+    expected = fbi_table.join(census_table)
+    with tempfile.TemporaryDirectory() as directory:
+      actual = fbi_table.join(census_table,
+                              out_of_core=True,
+                              spill_dir=directory)
+      # Partition files are cleaned up.
+      self.assertEqual(os.listdir(directory), [])
+    self.assertTrue(isinstance(actual, fbi_data_table))
+    self.assertEqual(len(actual.data), 3)
+    self.assertTrue(expected.data.equals(actual.data))
+
+  def test_join_exact_matching_same_as_in_memory(self):
+    fbi_data1 = pandas.DataFrame({
+      'index': ['california_sunnyvale', 'alabama_montgomery', 'lost_city'],
+      'foo': [1, 2, 3],
+    })
+    fbi_data2 = pandas.DataFrame({
+      'index': ['alabama_montgomery', 'california_sunnyvale', 'other'],
+      'bar': [3, 4, 5],
+    })
+    fbi_table1 = fbi_data_table(data=fbi_data1, suffix='_table1')
+    fbi_table2 = fbi_data_table(data=fbi_data2, suffix='_table2')
+    expected = fbi_table1.join(fbi_table2).data
+    actual = fbi_table1.join(fbi_table2, out_of_core=True).data
+    # Partitions are hashed, so rows may come out in a different order.
+    expected = expected.sort_values(by='index').reset_index(drop=True)
+    actual = actual.sort_values(by='index').reset_index(drop=True)
+    self.assertTrue(expected.equals(actual))
+
+  def test_join_exact_matching_mixed_dtypes(self):
+    # `merge` matches int and float keys by value, so partitioning must too.
+    fbi_data1 = pandas.DataFrame({'index': [1, 2, 3, 0], 'foo': [1, 2, 3, 4]})
+    fbi_data2 = pandas.DataFrame({
+      'index': [3.0, 1.0, 2.0, -0.0, 4.5],
+      'bar': [5, 6, 7, 8, 9]
+    })
+    fbi_table1 = fbi_data_table(data=fbi_data1, suffix='_table1')
+    fbi_table2 = fbi_data_table(data=fbi_data2, suffix='_table2')
+    expected = fbi_table1.join(fbi_table2).data
+    actual = fbi_table1.join(fbi_table2, out_of_core=True).data
+    self.assertEqual(len(expected), 4)
+    expected = expected.sort_values(by='index').reset_index(drop=True)
+    actual = actual.sort_values(by='index').reset_index(drop=True)
+    self.assertTrue(expected.equals(actual))
+
+  def test_join_out_of_core_output_file(self):
+    fbi_data = pandas.DataFrame({
+      'state': ['CA', 'AL', 'CA'],
+      'city': ['Sunnyvale', 'Montgomery', 'Mountain View'],
+      'population': [100, 200, 400],
+    })
+    census_data = pandas.DataFrame({
+      'state': ['AL', 'CA', 'CA'],
+      'city': ['Montgomery', 'Sunnyvale', 'Mountain View'],
+      get_header('Population Estimate (as of July 1) - 2017', 'census_2017'):
+      [200, 100, 401],
+    })
+    fbi_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    census_table = census_data_table(data=census_data, suffix='_census')
+    with tempfile.TemporaryDirectory() as directory:
+      output_file = os.path.join(directory, 'joined.csv')
+      joined_table = fbi_table.join(census_table,
+                                    out_of_core=True,
+                                    output_file=output_file)
+      self.assertIsNone(joined_table)
+      actual = pandas.read_csv(output_file, index_col=0)
+    self.assertEqual(actual.index.tolist(), [0, 1, 2])
+    self.assertEqual(actual['city_fbi'].tolist(),
+                     ['Montgomery', 'Mountain View', 'Sunnyvale'])
+
+  def test_join_out_of_core_no_matches(self):
+    fbi_data = pandas.DataFrame({
+      'state': ['CA'],
+      'city': ['Sunnyvale'],
+      'population': [100],
+    })
+    census_data = pandas.DataFrame({
+      'state': ['Isle of Man'],
+      'city': ['Avalon'],
+      get_header('Population Estimate (as of July 1) - 2017', 'census_2017'):
+      [1],
+    })
+    fbi_table = fbi_data_table(data=fbi_data)
+    census_table = census_data_table(data=census_data)
+    joined_table = fbi_table.join(census_table, out_of_core=True)
+    self.assertTrue(joined_table.data.empty)
+
+
+GAZETTEER_TEXT = (
+  'USPS\tGEOID\tANSICODE\tNAME\tLSAD\tFUNCSTAT\tALAND\tAWATER\t'
+  'ALAND_SQMI\tAWATER_SQMI\tINTPTLAT\tINTPTLONG                    \n'
+  'CA\t0677000\t02412009\tSunnyvale city\t25\tA\t56802924\t582270\t'
+  '21.932\t0.225\t37.385659\t-122.026344\n'
+  'AL\t0150000\t02404278\tMobile city\t25\tA\t359486544\t55462315\t'
+  '138.798\t21.414\t30.677436\t-88.118456\n')
+
+
+class TestGazetteer(unittest.TestCase):
+
+  def test_get_exact_matching_key(self):
+    self.assertEqual(gazetteer_data_table.get_exact_matching_key(), 'GEOID')
+
+  def test_get_population_key(self):
+    self.assertIsNone(gazetteer_data_table.get_population_key())
+
+  def test_read(self):
+    with tempfile.TemporaryDirectory() as directory:
+      file_path = os.path.join(directory, 'gazetteer.txt')
+      with open(file_path, 'w') as gazetteer_file:
+        gazetteer_file.write(GAZETTEER_TEXT)
+      df = gazetteer_data_table.read(file_path)
+    self.assertEqual(df['GEOID'].tolist(), ['0677000', '0150000'])
+    self.assertEqual(df['city'].tolist(), ['sunnyvale', 'mobile'])
+    self.assertEqual(df['state'].tolist(), ['california', 'alabama'])
+    self.assertEqual(df['latitude'].tolist(), [37.385659, 30.677436])
+    self.assertEqual(df['longitude'].tolist(), [-122.026344, -88.118456])
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,145 @@
+from data_table import DataTable, FuzzyMatchingKey, KeyComparison
+from data_table_census import Census as census_data_table
+from data_table_fbi import Fbi as fbi_data_table
+from headers_cleanup import HEADERS_CHANGE
+from join_profiler import JoinProfiler, bucket_label
+
+import os
+import pandas
+import tempfile
+import unittest
+from unittest import mock
+
+POPULATION_KEY = HEADERS_CHANGE['census_2017']['rename_columns'][
+  'Population Estimate (as of July 1) - 2017']
+
+
+class TestCompareKeysWithBranch(unittest.TestCase):
+
+  def test_branches(self):
+    sunnyvale = FuzzyMatchingKey(state='CA', city='Sunnyvale', population=100)
+    cases = [
+      (FuzzyMatchingKey('AL', 'Montgomery', 1), (-1, 'state_less', None)),
+      (FuzzyMatchingKey('WA', 'Seattle', 1), (1, 'state_greater', None)),
+      (FuzzyMatchingKey('CA', 'Sunnyvale', 1), (0, 'city_equal', None)),
+      (FuzzyMatchingKey('CA', 'Sunnyvale City', 102), (0, 'prefix_match', 2)),
+      (FuzzyMatchingKey('CA', 'Sunnyvale City',
+                        200), (1, 'prefix_population_rejected', 100)),
+      (FuzzyMatchingKey('CA', 'Mountain View', 1), (-1, 'city_less', None)),
+      (FuzzyMatchingKey('CA', 'Tracy', 1), (1, 'city_greater', None)),
+    ]
+    for key, expected in cases:
+      self.assertEqual(
+        tuple(DataTable.compare_keys_with_branch(key, sunnyvale)), expected)
+      self.assertEqual(DataTable.compare_keys(key, sunnyvale), expected[0])
+
+
+class TestJoinProfiler(unittest.TestCase):
+
+  def test_same_result_as_without_profiler(self):
+    fbi_data = pandas.DataFrame({
+      'state': ['AL', 'CA', 'CA'],
+      'city': ['Montgomery', 'Mountain View', 'Sunnyvale City'],
+      'population': [200, 100, 102],
+    })
+    census_data = pandas.DataFrame({
+      'state': ['AL', 'CA'],
+      'city': ['Montgomery', 'Sunnyvale'],
+      POPULATION_KEY: [200, 100],
+    })
+    fbi_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    census_table = census_data_table(data=census_data, suffix='_census')
+    expected = fbi_table.join_fuzzy_matching(census_table)
+    actual = fbi_table.join_fuzzy_matching(census_table,
+                                           profiler=JoinProfiler())
+    self.assertTrue(expected.data.equals(actual.data))
+
+  def test_no_branches_without_profiler(self):
+    fbi_data = pandas.DataFrame({
+      'state': ['AL', 'CA'],
+      'city': ['Montgomery', 'Sunnyvale City'],
+      'population': [200, 102],
+    })
+    census_data = pandas.DataFrame({
+      'state': ['CA'],
+      'city': ['Sunnyvale'],
+      POPULATION_KEY: [100],
+    })
+    fbi_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    census_table = census_data_table(data=census_data, suffix='_census')
+    with mock.patch.object(DataTable, 'compare_keys_with_branch') as compare:
+      joined_table = fbi_table.join_fuzzy_matching(census_table)
+    compare.assert_not_called()
+    self.assertEqual(joined_table.data['city_fbi'].tolist(), ['Sunnyvale City'])
+
+  def test_counts(self):
+    fbi_data = pandas.DataFrame({
+      'state': ['AL', 'CA', 'CA', 'CA'],
+      'city': ['Montgomery', 'Mountain View', 'San Jose', 'Sunnyvale City'],
+      'population': [200, 100, 1000, 102],
+    })
+    census_data = pandas.DataFrame({
+      'state': ['AL', 'CA', 'CA', 'CA'],
+      'city': ['Montgomery', 'San', 'Sunnyvale', 'Zzyzx'],
+      POPULATION_KEY: [200, 10, 100, 1],
+    })
+    fbi_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    census_table = census_data_table(data=census_data, suffix='_census')
+    profiler = JoinProfiler()
+    fbi_table.join_fuzzy_matching(census_table, profiler=profiler)
+    self.assertEqual(
+      dict(profiler.branch_counts), {
+        'city_equal': 1,
+        'city_less': 2,
+        'prefix_population_rejected': 1,
+        'prefix_match': 1,
+      })
+    # 'San Jose' vs 'San' is off by 9900%, 'Sunnyvale City' vs 'Sunnyvale'
+    # by 2%.
+    self.assertEqual(
+      {
+        bucket_label(bucket): count
+        for bucket, count in profiler.population_histogram.items()
+      }, {
+        '>100%': 1,
+        '2%': 1
+      })
+    phases = {frames[0] for frames in profiler.times}
+    self.assertEqual(
+      phases,
+      {'sort', 'extract_keys', 'compare_keys', 'assemble_rows', 'concat'})
+
+  def test_summary(self):
+    profiler = JoinProfiler()
+    profiler.add_time(['sort'], 0.5)
+    for comparison in [(0, 'prefix_match', 2), (1, 'city_greater', None)]:
+      profiler.add_comparison(KeyComparison(*comparison), 0.25)
+    summary = profiler.summary()
+    self.assertIn('Time (1000.0 ms total):', summary)
+    self.assertIn('compare_keys branches (2 comparisons):', summary)
+    self.assertIn('prefix_match', summary)
+    self.assertIn('Population difference of city name prefix matches:', summary)
+
+  def test_write_flamegraph(self):
+    profiler = JoinProfiler()
+    profiler.add_time(['sort'], 0.5)
+    profiler.add_time(['compare_keys', 'city_equal'], 0.25)
+    profiler.add_time(['compare_keys', 'city_equal'], 0.25)
+    with tempfile.TemporaryDirectory() as directory:
+      file_path = os.path.join(directory, 'join.folded')
+      profiler.write_flamegraph(file_path)
+      with open(file_path) as flamegraph_file:
+        lines = flamegraph_file.read().splitlines()
+    self.assertEqual(lines, [
+      'join_fuzzy_matching;compare_keys;city_equal 500000',
+      'join_fuzzy_matching;sort 500000'
+    ])
+
+  def test_bucket_label(self):
+    self.assertEqual([bucket_label(bucket) for bucket in range(9)], [
+      '0%', '1%', '2%', '3-5%', '6-10%', '11-25%', '26-50%', '51-100%', '>100%'
+    ])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,142 @@
+from data_table_census import Census as census_data_table
+from data_table_fbi import Fbi as fbi_data_table
+from headers_cleanup import HEADERS_CHANGE
+
+import gc
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+import pandas
+import pickle
+import unittest
+
+POPULATION_KEY = HEADERS_CHANGE['census_2017']['rename_columns'][
+  'Population Estimate (as of July 1) - 2017']
+
+
+def sum_population(handle):
+  data_table = fbi_data_table.from_shared_memory(handle)
+  return data_table.data['population'].sum()
+
+
+class TestSharedDataTable(unittest.TestCase):
+
+  def test_round_trip(self):
+    fbi_data = pandas.DataFrame(
+      {
+        'state': ['california', 'alabama', 'california'],
+        'city': ['sunnyvale', None, 'mountain view'],
+        'population': [100.0, 200.0, None],
+        'robbery': [1, 2, 3],
+      },
+      index=[5, 6, 7])
+    data_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    with data_table.to_shared_memory() as shared:
+      shared_table = fbi_data_table.from_shared_memory(shared.handle)
+      self.assertTrue(isinstance(shared_table, fbi_data_table))
+      self.assertEqual(shared_table.suffix, '_fbi')
+      # String columns come back as categoricals.
+      actual = shared_table.data.astype({'state': object, 'city': object})
+      expected = data_table.data.astype({'state': object, 'city': object})
+      self.assertTrue(expected.equals(actual))
+      del shared_table
+
+  def test_strings_round_trip(self):
+    # Trailing NULs, non-ASCII and empty strings all survive.
+    cities = ['a\x00', 'a', 'ca\u00f1on city', '', 'a\x00']
+    data_table = fbi_data_table(data=pandas.DataFrame({'city': cities}))
+    with data_table.to_shared_memory() as shared:
+      shared_table = fbi_data_table.from_shared_memory(shared.handle)
+      self.assertEqual(shared_table.data['city'].tolist(), cities)
+      del shared_table
+
+  def test_extension_dtype_rejected(self):
+    data_table = fbi_data_table(data=pandas.DataFrame(
+      {'robbery': pandas.array([1, None], dtype='Int64')}))
+    with self.assertRaises(TypeError):
+      data_table.to_shared_memory()
+
+  def test_data_outlives_table(self):
+    fbi_data = pandas.DataFrame({'population': numpy.arange(100000.0)})
+    data_table = fbi_data_table(data=fbi_data)
+    with data_table.to_shared_memory() as shared:
+      data = fbi_data_table.from_shared_memory(shared.handle).data
+      gc.collect()
+      self.assertEqual(data['population'].sum(), fbi_data['population'].sum())
+      del data
+
+  def test_range_index(self):
+    data_table = census_data_table(data=pandas.DataFrame({'foo': [1, 2]}))
+    with data_table.to_shared_memory() as shared:
+      self.assertEqual(shared.handle.index, (0, 2, 1))
+      shared_table = census_data_table.from_shared_memory(shared.handle)
+      self.assertTrue(shared_table.data.equals(data_table.data))
+      del shared_table
+
+  def test_zero_copy_read_only(self):
+    fbi_data = pandas.DataFrame({'city': ['sunnyvale'], 'robbery': [1]})
+    data_table = fbi_data_table(data=fbi_data)
+    with data_table.to_shared_memory() as shared:
+      shared_table = fbi_data_table.from_shared_memory(shared.handle)
+      with self.assertRaises(ValueError):
+        shared_table.data.loc[0, 'robbery'] = 10
+      # Writes to the shared memory show up in the attached table, so it's a
+      # view rather than a copy.
+      robbery = shared.handle.columns[1]
+      segment = shared_memory.SharedMemory(name=robbery.segment_name)
+      numpy.ndarray((robbery.length,), dtype=robbery.dtype,
+                    buffer=segment.buf)[0] = 10
+      self.assertEqual(shared_table.data.loc[0, 'robbery'], 10)
+      del shared_table
+      segment.close()
+
+  def test_handle_is_small(self):
+    data_table = fbi_data_table(data=pandas.DataFrame({
+      'population': numpy.arange(100000, dtype=float),
+      # Unique strings are shared too, not pickled into the handle.
+      'city': ['city {}'.format(i) for i in range(100000)],
+    }))
+    with data_table.to_shared_memory() as shared:
+      self.assertLess(len(pickle.dumps(shared.handle)), 1000)
+      shared_table = fbi_data_table.from_shared_memory(shared.handle)
+      self.assertEqual(shared_table.data['city'].iloc[12345], 'city 12345')
+      del shared_table
+
+  def test_join_fuzzy_matching_same_as_in_memory(self):
+    # Strings appear out of order, so sorting by order of appearance would
+    # break the fuzzy join's merge.
+    fbi_data = pandas.DataFrame({
+      'state': ['california', 'alabama', 'california', 'wyoming'],
+      'city': ['sunnyvale', 'montgomery', 'mountain view', 'cheyenne'],
+      'population': [100, 200, 300, 400],
+    })
+    census_data = pandas.DataFrame({
+      'state': ['wyoming', 'california', 'california', 'alabama'],
+      'city': ['cheyenne', 'sunnyvale', 'mountain view', 'montgomery'],
+      POPULATION_KEY: [400, 100, 300, 200],
+    })
+    fbi_table = fbi_data_table(data=fbi_data, suffix='_fbi')
+    census_table = census_data_table(data=census_data, suffix='_census')
+    expected = fbi_table.join(census_table).data
+    with fbi_table.to_shared_memory() as shared_fbi:
+      with census_table.to_shared_memory() as shared_census:
+        attached_fbi_table = fbi_data_table.from_shared_memory(
+          shared_fbi.handle)
+        attached_census_table = census_data_table.from_shared_memory(
+          shared_census.handle)
+        actual = attached_fbi_table.join(attached_census_table).data
+        del attached_fbi_table, attached_census_table
+    self.assertEqual(len(expected), 4)
+    self.assertTrue(expected.equals(actual.astype(expected.dtypes)))
+
+  def test_worker_processes(self):
+    fbi_data = pandas.DataFrame({'population': [100.0, 200.0, None]})
+    data_table = fbi_data_table(data=fbi_data)
+    with data_table.to_shared_memory() as shared:
+      with multiprocessing.Pool(2) as pool:
+        results = pool.map(sum_population, [shared.handle] * 4)
+    self.assertEqual(results, [300.0] * 4)
+
+
+if __name__ == '__main__':
+  unittest.main()
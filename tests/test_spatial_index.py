@@ -0,0 +1,88 @@
+from data_table_gazetteer import Gazetteer as gazetteer_data_table
+from spatial_index import SpatialIndex
+
+import os
+import pandas
+import tempfile
+import unittest
+
+
+def make_table():
+  return gazetteer_data_table(data=pandas.DataFrame({
+    'city': ['san francisco', 'oakland', 'san jose', 'los angeles', 'nowhere'],
+    'latitude': [37.7749, 37.8044, 37.3382, 34.0522, None],
+    'longitude': [-122.4194, -122.2712, -121.8863, -118.2437, None],
+  }))
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+  def test_skips_rows_without_location(self):
+    index = SpatialIndex(make_table())
+    self.assertEqual(len(index.data), 4)
+
+  def test_query_radius(self):
+    index = SpatialIndex(make_table())
+    rows = index.query_radius(37.7749, -122.4194, 50)
+    self.assertEqual(rows['city'].tolist(),
+                     ['san francisco', 'oakland', 'san jose'])
+    # San Francisco to Oakland is about 8.4 miles.
+    self.assertAlmostEqual(rows['distance miles'].iloc[1], 8.4, places=0)
+
+  def test_query_radius_empty(self):
+    index = SpatialIndex(make_table())
+    rows = index.query_radius(0, 0, 50)
+    self.assertEqual(len(rows), 0)
+
+  def test_query_radius_batch(self):
+    index = SpatialIndex(make_table())
+    results = index.query_radius([37.3382, 34.0522], [-121.8863, -118.2437], 10)
+    self.assertEqual([rows['city'].tolist() for rows in results],
+                     [['san jose'], ['los angeles']])
+
+  def test_query_nearest(self):
+    index = SpatialIndex(make_table())
+    rows = index.query_nearest(34.0, -118.0, k=2)
+    self.assertEqual(rows['city'].tolist(), ['los angeles', 'san jose'])
+
+  def test_query_nearest_batch(self):
+    index = SpatialIndex(make_table())
+    results = index.query_nearest([37.8, 34.0], [-122.3, -118.0], k=1)
+    self.assertEqual([rows['city'].tolist() for rows in results],
+                     [['oakland'], ['los angeles']])
+
+  def test_query_nearest_more_than_indexed(self):
+    index = SpatialIndex(make_table())
+    rows = index.query_nearest(34.0, -118.0, k=10)
+    self.assertEqual(len(rows), 4)
+
+  def test_query_nearest_invalid_k(self):
+    index = SpatialIndex(make_table())
+    with self.assertRaises(ValueError):
+      index.query_nearest(34.0, -118.0, k=0)
+
+  def test_query_nearest_empty_index(self):
+    table = gazetteer_data_table(data=pandas.DataFrame({
+      'city': ['nowhere'],
+      'latitude': [None],
+      'longitude': [None],
+    }))
+    index = SpatialIndex(table)
+    self.assertEqual(len(index.query_nearest(34.0, -118.0, k=1)), 0)
+    results = index.query_nearest([37.8, 34.0], [-122.3, -118.0], k=1)
+    self.assertEqual([len(rows) for rows in results], [0, 0])
+
+  def test_save_and_load(self):
+    index = SpatialIndex(make_table())
+    with tempfile.TemporaryDirectory() as directory:
+      file_path = os.path.join(directory, 'index.pickle')
+      index.save(file_path)
+      loaded = SpatialIndex.load(file_path)
+    self.assertTrue(loaded.data.equals(index.data))
+    self.assertEqual(
+      loaded.query_radius(37.7749, -122.4194, 50)['city'].tolist(),
+      ['san francisco', 'oakland', 'san jose'])
+
+
+if __name__ == '__main__':
+  unittest.main()